@@ -0,0 +1,80 @@
+"""
+Shows the I/O versus CPU trade-off of compressing the cache: load and
+dump time of realistic pocket_list payloads with and without zlib, the
+file size and the load time estimated for disks of a given speed.
+
+Load times are measured with the file in the page cache, so they are
+pure CPU time. Reading the file from disk adds size / disk speed.
+
+Usage: python benchmarks/bench_compression.py [items ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from test_server import generate_account  # noqa: E402
+from workflow.workflow import (CompressedSerializer,  # noqa: E402
+                               MarshalSerializer, manager)
+
+# Disk speeds in MB/s: encrypted network home, old HDD, SATA SSD
+DISK_SPEEDS = [20, 100, 500]
+
+
+def serializers():
+    yield 'marshal', manager.serializer('marshal')
+    for level in [1, 6, 9]:
+        yield 'zlib level %d' % level, CompressedSerializer(
+            MarshalSerializer, levels=((0, level),))
+    yield 'zmarshal', manager.serializer('zmarshal')
+
+
+def measure(func, number=5):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def compare(directory, items):
+    links = generate_account(items)
+    for link in links.values():
+        link['resolved_title'] = u'Caf\xe9 ' + link['resolved_title']
+    print '%d links' % items
+    print '  %-14s %8s %8s %9s  %s' % (
+        'serializer', 'dump', 'load', 'size', ' '.join(
+            '%5d MB/s' % speed for speed in DISK_SPEEDS))
+
+    for name, serializer in serializers():
+        path = os.path.join(directory, 'pocket_list')
+
+        def dump():
+            with open(path, 'wb') as file_obj:
+                serializer.dump(links, file_obj)
+
+        def load():
+            with open(path, 'rb') as file_obj:
+                return serializer.load(file_obj)
+
+        dumped = measure(dump)
+        assert load() == links
+        loaded = measure(load)
+        size = os.path.getsize(path) / 1024.0 / 1024
+        print '  %-14s %5.1f ms %5.1f ms %6.2f MB  %s' % (
+            name, dumped * 1000, loaded * 1000, size, ' '.join(
+                '%7.1f ms' % ((loaded + size / speed) * 1000)
+                for speed in DISK_SPEEDS))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 10000]
+    directory = tempfile.mkdtemp()
+    try:
+        for items in sizes:
+            compare(directory, items)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Compares JSON decoding of realistic /v3/get pages between the standard
+library and workflow.jsoncodec.
+
+Usage: python benchmarks/bench_json.py [items per page]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from test_server import generate_account  # noqa: E402
+from workflow import jsoncodec  # noqa: E402
+
+
+def measure(name, func, size, number=10):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print '%-32s %7.1f ms  %6.1f MB/s' % (
+        name, seconds * 1000, size / seconds / 1024 / 1024)
+    return seconds
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    account = generate_account(items)
+    for item in account.values():
+        item['resolved_title'] = u'Caf\xe9 ' + item['resolved_title']
+    page = {'status': 1, 'complete': 1, 'since': 1, 'list': account}
+    payload = json.dumps(page)
+
+    print 'jsoncodec backend: %s, payload: %d items, %.1f MB' % (
+        jsoncodec.BACKEND, items, len(payload) / 1024.0 / 1024)
+    stdlib = measure('decode json.loads', lambda: json.loads(
+        payload, 'utf-8'), len(payload))
+    codec = measure('decode jsoncodec.loads', lambda: jsoncodec.loads(
+        payload, 'utf-8'), len(payload))
+    print 'decode speedup: %.2fx' % (stdlib / codec)
+
+
+if __name__ == '__main__':
+    main()
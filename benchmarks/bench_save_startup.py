@@ -0,0 +1,77 @@
+"""
+Measures how long pocket_save.py takes to run when no link is found, the
+path of every save that is triggered outside a browser without a link
+on the clipboard.
+
+Fake `osascript` and `pbpaste` programs on PATH report a frontmost app
+that is not a browser and an empty clipboard. A fake `security` program
+records each Keychain access, which this path should not make.
+
+Usage: python benchmarks/bench_save_startup.py [runs]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+FAKE_PROGRAMS = {
+    'osascript': '#!/bin/sh\necho Finder\n',
+    'pbpaste': '#!/bin/sh\n',
+    'security': ('#!/bin/sh\necho x >> "$SECURITY_LOG"\n'
+                 'echo \'password: "access_token"\'\n'),
+}
+
+
+def measure(name, argv, env, runs):
+    timings = []
+    devnull = open(os.devnull, 'w')
+    for _ in range(runs):
+        shutil.rmtree(env['alfred_workflow_cache'], ignore_errors=True)
+        started = time.time()
+        subprocess.check_call(argv, cwd=SRC, env=env, stdout=devnull,
+                              stderr=devnull)
+        timings.append(time.time() - started)
+    devnull.close()
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print '%-32s median %6.1f ms  min %6.1f ms' % (
+        name, median * 1000, timings[0] * 1000)
+    return median
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    directory = tempfile.mkdtemp()
+    try:
+        bindir = os.path.join(directory, 'bin')
+        os.mkdir(bindir)
+        for name, script in FAKE_PROGRAMS.items():
+            path = os.path.join(bindir, name)
+            with open(path, 'w') as fp:
+                fp.write(script)
+            os.chmod(path, 0o755)
+
+        env = dict(os.environ)
+        env['PATH'] = bindir + os.pathsep + env.get('PATH', '')
+        env['alfred_workflow_cache'] = os.path.join(directory, 'cache')
+        env['alfred_workflow_data'] = os.path.join(directory, 'data')
+        env['SECURITY_LOG'] = os.path.join(directory, 'security.log')
+
+        measure('python -c pass', [sys.executable, '-c', 'pass'], env, runs)
+        measure('pocket_save.py, no link',
+                [sys.executable, 'pocket_save.py'], env, runs)
+        spawned = 0
+        if os.path.exists(env['SECURITY_LOG']):
+            with open(env['SECURITY_LOG']) as fp:
+                spawned = len(fp.readlines())
+        print 'Keychain accesses: %d' % spawned
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares the cache serializers on realistic pocket_list payloads: time
+to load and dump them and the size of the cache file.
+
+Usage: python benchmarks/bench_serializers.py [items ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from test_server import generate_account  # noqa: E402
+from workflow.workflow import manager  # noqa: E402
+
+SERIALIZERS = ['cpickle', 'json', 'marshal']
+
+
+def measure(func, number=10):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def compare(directory, items):
+    links = generate_account(items)
+    for link in links.values():
+        link['resolved_title'] = u'Caf\xe9 ' + link['resolved_title']
+    print '%d links' % items
+
+    loads = {}
+    for name in SERIALIZERS:
+        serializer = manager.serializer(name)
+        path = os.path.join(directory, 'pocket_list.%s' % name)
+
+        def dump():
+            with open(path, 'wb') as file_obj:
+                serializer.dump(links, file_obj)
+
+        def load():
+            with open(path, 'rb') as file_obj:
+                return serializer.load(file_obj)
+
+        dumped = measure(dump)
+        assert load() == links
+        loads[name] = measure(load)
+        print '  %-8s load %7.1f ms  dump %7.1f ms  size %7.1f KB' % (
+            name, loads[name] * 1000, dumped * 1000,
+            os.path.getsize(path) / 1024.0)
+    print '  marshal loads %.2fx faster than cpickle' % (
+        loads['cpickle'] / loads['marshal'])
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 2000, 10000]
+    directory = tempfile.mkdtemp()
+    try:
+        for items in sizes:
+            compare(directory, items)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Measures how fast a full sync fetches the Pocket list from the local API
+stand-in for simple and complete item details.
+
+Usage: python benchmarks/bench_sync.py [items] [latency in seconds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pocket_api import Pocket  # noqa: E402
+from pocket_refresh import fetch_pages  # noqa: E402
+from test_server import PocketServer  # noqa: E402
+
+
+def measure(server, detail_type):
+    pocket = Pocket('consumer_key', 'access_token')
+    requests, sent = server.requests, server.bytes_sent
+    started = time.time()
+    items = 0
+    for page, _, _ in fetch_pages(pocket, 0, detail_type):
+        items += len(page)
+    elapsed = time.time() - started
+    print '%-9s %6d items  %3d requests  %6.1f KB  %7.1f ms  %8.0f items/s' % (
+        detail_type, items, server.requests - requests,
+        (server.bytes_sent - sent) / 1024.0, elapsed * 1000,
+        items / elapsed)
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    server = PocketServer(items=items, latency=latency).start()
+    Pocket.api_endpoints = server.endpoints()
+    try:
+        measure(server, 'simple')
+        measure(server, 'complete')
+    finally:
+        Pocket.connection_pool.close()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
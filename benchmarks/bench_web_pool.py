@@ -0,0 +1,107 @@
+"""
+Compares workflow.web.post with a pooled keep-alive connection against a
+local HTTPS stand-in for the Pocket API.
+
+Usage: python benchmarks/bench_web_pool.py [requests]
+"""
+import BaseHTTPServer
+import SocketServer
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from workflow import web  # noqa: E402
+
+BODY = json.dumps({'status': 1, 'complete': 1, 'list': {}, 'since': 1})
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write like a real server would
+    wbufsize = -1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('content-length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def start_server(directory):
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.check_call(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-days', '1', '-subj', '/CN=127.0.0.1',
+         '-keyout', keyfile, '-out', certfile],
+        stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+
+    server = Server(('127.0.0.1', 0), Handler)
+    server.socket = ssl.wrap_socket(server.socket, keyfile=keyfile,
+                                    certfile=certfile, server_side=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def measure(name, post, url, count):
+    payload = {'consumer_key': 'key', 'access_token': 'token',
+               'count': '2000', 'offset': '0'}
+    post(url, payload)  # warm up
+    started = time.time()
+    for _ in range(count):
+        r = post(url, payload)
+        assert r.status_code == 200 and r.json()['status'] == 1
+    elapsed = time.time() - started
+    print '%-22s %4d requests  %7.1f ms total  %6.2f ms/request' % (
+        name, count, elapsed * 1000, elapsed * 1000 / count)
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    directory = tempfile.mkdtemp()
+    try:
+        server = start_server(directory)
+        url = 'https://127.0.0.1:%d/v3/get' % server.server_port
+
+        # The stand-in uses a self-signed certificate
+        context = ssl._create_unverified_context()
+        ssl._create_default_https_context = ssl._create_unverified_context
+        pool = web.ConnectionPool(context=context)
+
+        fresh = measure('web.post (urllib2)', lambda u, d: web.post(
+            u, data=d, timeout=10), url, count)
+        pooled = measure('ConnectionPool.post', lambda u, d: pool.post(
+            u, data=d, timeout=10), url, count)
+        print 'speedup: %.1fx' % (fresh / pooled)
+
+        pool.close()
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,4 @@
 CONSUMER_KEY = '25349-924436f8cc1abc8370f02d9d'
 REDIRECT_URI = 'https://github.com/fniephaus/alfred-pocket'
+# Everything the workflow caches is made of built-in types
+CACHE_SERIALIZER = 'marshal'
@@ -4,10 +4,11 @@ from time import sleep
 import random
 
 from pocket_api import Pocket, RateLimitException
-from workflow import Workflow, PasswordNotFound
+from workflow import Workflow3, PasswordNotFound
 from workflow.background import run_in_background, is_running
 
 from pocket_errors import ERROR_MESSAGES
+from pocket_scheduler import refresh_due
 import config
 
 
@@ -15,13 +16,19 @@ CATEGORIES = ['My List', 'Favorites', 'My Tags', 'Archive', 'Articles',
               'Videos', 'Images', 'Random']
 ACTIONS = [x.replace(' ', '').lower() for x in CATEGORIES]
 REQUIRED_KEYS = ['item_id', 'given_title', 'given_url', 'time_added']
+# Fields that are passed on to pocket_launcher.py as workflow variables
+ITEM_VARIABLES = ['item_id', 'given_url', 'status', 'favorite']
 
 # GitHub repo for self-updating
 GITHUB_UPDATE_CONF = {'github_slug': 'fniephaus/alfred-pocket'}
 # GitHub Issues
 HELP_URL = 'https://github.com/fniephaus/alfred-pocket/issues'
 
-WF = Workflow(update_settings=GITHUB_UPDATE_CONF, help_url=HELP_URL)
+# Seconds after which the script filter reloads itself during a sync
+SYNC_RERUN = 1
+
+WF = Workflow3(update_settings=GITHUB_UPDATE_CONF, help_url=HELP_URL)
+WF.cache_serializer = config.CACHE_SERIALIZER
 
 
 def main(_):
@@ -56,6 +63,8 @@ def main(_):
             WF.add_item(msg[0], msg[1], icon=get_icon('alert'),
                         valid=False)
 
+        add_sync_status()
+
         if (not user_input[0] or
                 (len(user_input) == 1 and user_input[0].startswith('in:'))):
             for category, action in zip(CATEGORIES, ACTIONS):
@@ -71,7 +80,7 @@ def main(_):
                     valid=False
                 )
             elif user_input[0] == 'in:mytags':
-                tags = WF.cached_data('pocket_tags', max_age=120)
+                tags = WF.cached_data('pocket_tags', max_age=0)
                 if tags:
                     user_tag = user_input[1].strip('#')
                     if user_tag in tags:
@@ -106,7 +115,7 @@ def main(_):
                 filter_and_add_items(links, user_input)
 
         # Update Pocket list in background
-        if not WF.cached_data_fresh('pocket_list', max_age=10):
+        if refresh_due(WF):
             refresh_list()
 
     except PasswordNotFound:  # pragma: no cover
@@ -124,14 +133,28 @@ def register_magic_arguments():
     WF.magic_arguments['deauth'] = delete_access_token
 
 
+def add_sync_status():
+    status = WF.cached_data('pocket_sync_status', max_age=120)
+    if not status:
+        return
+    WF.add_item(
+        'Syncing your Pocket list... %d/%d' % (
+            status['fetched'], status['total']),
+        'Showing the newest links until the sync has finished',
+        icon=get_icon('info'),
+        valid=False
+    )
+    WF.rerun = SYNC_RERUN
+
+
 def get_links(tries=10):
-    links = WF.cached_data('pocket_list', max_age=120)
+    links = WF.cached_data('pocket_list', max_age=0)
 
     # Wait for data
     while links is None:
         refresh_list()
         sleep(0.5)
-        links = WF.cached_data('pocket_list', max_age=120)
+        links = WF.cached_data('pocket_list', max_age=0)
         if tries > 0:
             tries -= 1
         else:
@@ -169,6 +192,7 @@ def link_matches_filter(user_input, link):
 def filter_and_add_items(links, user_input):
     links = sorted(links, key=lambda x: int(x['time_added']), reverse=True)
     links_count = len(links)
+    items_count = 0
     for index, link in enumerate(links):
         if all(x in link for x in REQUIRED_KEYS):
             title = get_title(link)
@@ -181,14 +205,18 @@ def filter_and_add_items(links, user_input):
 
             if (user_input.lower() in title.lower() or
                     user_input.lower() in subtitle.lower()):
-                WF.add_item(
+                item = WF.add_item(
                     title,
                     subtitle,
                     arg=link['given_url'],
                     uid=link['given_url'],
                     valid=True
                 )
-    if WF._items == []:
+                # Let the launcher act on the item without looking it up
+                for name in ITEM_VARIABLES:
+                    item.setvar(name, link.get(name, ''))
+                items_count += 1
+    if items_count == 0:
         WF.add_item(
             'No links found for "%s".' % user_input,
             valid=False
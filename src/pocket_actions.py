@@ -0,0 +1,373 @@
+import copy
+import time
+import uuid
+from time import sleep
+from urllib2 import URLError
+from pocket_api import (Pocket, AuthException, InvalidQueryException,
+                        PocketException)
+from workflow import Workflow, PasswordNotFound
+from workflow.background import run_in_background
+from workflow.util import LockFile
+
+from pocket_cache import locked_links, cache_links, merge_item
+import config
+
+# Seconds to wait for further actions before sending the queued ones
+COALESCE_WINDOW = 1.5
+# Number of queued actions that are sent right away in one request
+BATCH_SIZE = 50
+POLL_INTERVAL = 0.2
+# Failed sends are retried with exponential backoff before the job gives
+# up, the actions stay queued for the next job
+RETRY_ATTEMPTS = 5
+RETRY_DELAY = 2
+RETRY_DELAY_MAX = 60
+# Saved links are listed under a temporary item_id until Pocket assigns one
+PENDING_PREFIX = 'pending-'
+# Fields of a cached item that the actions change
+ACTION_FIELDS = {
+    'archive': 'status',
+    'readd': 'status',
+    'favorite': 'favorite',
+    'unfavorite': 'favorite',
+    'tags_add': 'tags',
+    'tags_remove': 'tags',
+    'tags_replace': 'tags',
+    'tags_clear': 'tags',
+}
+
+
+def main():
+    wf = Workflow()
+    wf.cache_serializer = config.CACHE_SERIALIZER
+    error = None
+    try:
+        access_token = wf.get_password('pocket_access_token')
+        pocket_instance = Pocket(config.CONSUMER_KEY, access_token)
+
+        failures = 0
+        while True:
+            actions = wf.stored_data('pocket_actions') or []
+            if not actions:
+                break
+
+            # Wait until the user stops triggering actions or a batch is full
+            newest = max(a['queued'] for a in actions)
+            if (len(actions) < BATCH_SIZE and
+                    time.time() - newest < COALESCE_WINDOW):
+                sleep(POLL_INTERVAL)
+                continue
+
+            try:
+                send_batch(wf, pocket_instance, next_batch(actions))
+                failures = 0
+            except (URLError, PocketException), e:
+                if (isinstance(e, (AuthException, InvalidQueryException)) or
+                        failures >= RETRY_ATTEMPTS):
+                    raise
+                failures += 1
+                wf.logger.debug('sending actions failed: %s', e)
+                sleep(min(RETRY_DELAY_MAX, RETRY_DELAY * 2 ** failures))
+
+    except (AuthException, URLError, PocketException, PasswordNotFound), e:
+        error = type(e).__name__
+        wf.cache_data('pocket_error', error)
+        wf.logger.error(error)
+
+
+def queue_actions(wf, queries):
+    '''
+    Applies actions to the cached list right away, updating it a single
+    time for all of them, and queues them for /v3/send in a background job
+    that sends all queued actions together
+
+    '''
+    queued = time.time()
+    actions = [{'query': q, 'queued': queued} for q in queries]
+    with locked_links(wf) as links:
+        if links is not None:
+            for action in actions:
+                # Kept to revert the change if Pocket rejects the action
+                action['undo'] = snapshot(links, action['query'])
+                apply_action(links, action['query'])
+
+        # Queued while the list is locked, so that a sync merging a page
+        # either re-applies the actions or is overwritten by them
+        with LockFile(wf.datafile('pocket_actions')):
+            stored = wf.stored_data('pocket_actions') or []
+            stored.extend(actions)
+            wf.store_data('pocket_actions', stored)
+
+        if links is not None:
+            # Archiving and favoriting change none of the indexes
+            cache_links(wf, links, set(
+                q['item_id'] for q in queries if ACTION_FIELDS.get(
+                    q['action']) not in ('status', 'favorite')))
+
+    start_flush(wf)
+
+
+def queue_add(wf, url, title, tags, archived=False):
+    '''
+    Queues a link to be saved by the background job and lists it right
+    away under a temporary item_id, which is returned
+
+    '''
+    item_id = PENDING_PREFIX + uuid.uuid4().hex[:12]
+    query = {'action': 'add', 'item_id': item_id, 'url': url,
+             'tags': ','.join(tags), 'time': str(int(time.time()))}
+    if title:
+        query['title'] = title
+    queries = [query]
+    if archived:
+        queries.append({'action': 'archive', 'item_id': item_id})
+    queue_actions(wf, queries)
+    return item_id
+
+
+def is_pending(item_id):
+    return unicode(item_id).startswith(PENDING_PREFIX)
+
+
+def apply_action(links, query):
+    '''
+    Applies an action for /v3/send to the matching item of the given list
+
+    '''
+    item_id = query['item_id']
+    action = query['action']
+    tags = [t.strip() for t in query.get('tags', '').split(',') if t.strip()]
+
+    if action == 'add' and item_id not in links:
+        item = {'item_id': item_id, 'given_url': query['url']}
+        merge_item(links, item, query.get('title'), tags, False,
+                   query['time'])
+        return
+
+    item = links.get(item_id)
+    if item is None:
+        return
+
+    if action == 'delete':
+        del links[item_id]
+    elif action in ('archive', 'readd'):
+        item['status'] = '1' if action == 'archive' else '0'
+    elif action in ('favorite', 'unfavorite'):
+        item['favorite'] = '1' if action == 'favorite' else '0'
+    elif action in ('tags_replace', 'tags_clear'):
+        item['tags'] = {}
+    if action in ('tags_add', 'tags_replace'):
+        item.setdefault('tags', {}).update(
+            (t, {'item_id': item_id, 'tag': t}) for t in tags)
+    elif action == 'tags_remove':
+        for tag in tags:
+            item.get('tags', {}).pop(tag, None)
+
+
+def snapshot(links, query):
+    '''
+    Returns the values of the item that query is about to change, which
+    undo_action restores
+
+    '''
+    item = links.get(query['item_id'])
+    if item is None:
+        return None
+    if query['action'] == 'delete':
+        return copy.deepcopy(item)
+    field = ACTION_FIELDS.get(query['action'])
+    if field is None:
+        return None
+    return {field: copy.deepcopy(item.get(field))}
+
+
+def undo_action(links, query, undo):
+    '''
+    Reverts the local change of an action with the values snapshot
+    returned before it was applied
+
+    '''
+    if undo is None:
+        return
+    item_id = query['item_id']
+    if query['action'] == 'delete':
+        links.setdefault(item_id, undo)
+        return
+
+    item = links.get(item_id)
+    if item is None:
+        return
+    for field, value in undo.iteritems():
+        if value is None:
+            item.pop(field, None)
+        else:
+            item[field] = value
+
+
+def apply_pending(wf, links, items):
+    '''
+    Re-applies queued actions to those of the given items that were just
+    replaced by their server version
+
+    '''
+    for action in wf.stored_data('pocket_actions') or []:
+        if action['query']['item_id'] in items:
+            apply_action(links, action['query'])
+
+
+def has_pending(wf):
+    return bool(wf.stored_data('pocket_actions'))
+
+
+def next_batch(actions):
+    '''
+    Returns the queued actions to send next. Actions on a link that is
+    saved in the same batch wait for the item_id Pocket assigns to it.
+
+    '''
+    batch = []
+    adding = set()
+    for action in actions[:BATCH_SIZE]:
+        query = action['query']
+        if query['action'] == 'add':
+            adding.add(query['item_id'])
+        elif query['item_id'] in adding:
+            break
+        batch.append(action)
+    return batch
+
+
+def send_batch(wf, pocket_instance, batch):
+    for action in batch:
+        query = action['query']
+        if query['action'] == 'add' and is_pending(query['item_id']):
+            query = dict(query)
+            del query['item_id']
+        pocket_instance.add_bulk_query(query)
+    try:
+        response = pocket_instance.commit()[0]
+    except InvalidQueryException:
+        # Pocket will never accept this batch, so don't keep retrying it
+        finish_batch(wf, batch, [False] * len(batch))
+        raise
+
+    results = response.get('action_results') or []
+    finish_batch(wf, batch, results)
+
+    failed = [action['query'] for action, result in zip(batch, results)
+              if result is False]
+    for query in failed:
+        wf.logger.error('%s of item %s failed', query['action'],
+                        query['item_id'])
+    wf.logger.debug('sent %d actions, %d failed', len(batch), len(failed))
+
+    if failed:
+        wf.cache_data('pocket_error', 'ActionError')
+    return failed
+
+
+def finish_batch(wf, batch, results):
+    '''
+    Removes the sent actions from the queue, replaces the temporary
+    item_id of the links saved with them by the one Pocket assigned and
+    reverts the actions Pocket rejected
+
+    '''
+    item_ids = {}
+    added = []
+    for i, action in enumerate(batch):
+        query = action['query']
+        if query['action'] != 'add' or not is_pending(query['item_id']):
+            continue
+        result = results[i] if i < len(results) else None
+        if isinstance(result, dict) and result.get('item_id'):
+            item_ids[query['item_id']] = unicode(result['item_id'])
+            added.append((query, result))
+        else:
+            # Pocket did not save the link, so nothing else can happen to it
+            item_ids[query['item_id']] = None
+
+    rejected = [i for i, result in enumerate(results)
+                if result is False and batch[i]['query']['action'] != 'add']
+
+    dequeue(wf, len(batch), item_ids)
+    if not item_ids and not rejected:
+        return
+
+    with locked_links(wf) as links:
+        if links is None:
+            return
+
+        replace_pending(links, item_ids, added)
+        reverted = revert_rejected(links, batch, rejected)
+        new_ids = set(i for i in item_ids.itervalues() if i)
+        # Keep the local changes of the actions that are still queued
+        apply_pending(wf, links, new_ids | reverted)
+        cache_links(wf, links, set(item_ids) | new_ids | reverted)
+
+
+def replace_pending(links, item_ids, added):
+    '''
+    Replaces the temporary entries of saved links in the cached list by
+    the items Pocket returned, keeping the changes made to them locally
+
+    '''
+    now = str(int(time.time()))
+    for query, item in added:
+        link = links.pop(query['item_id'], None)
+        # Deleted before it was sent, the queued delete follows
+        if link is None:
+            continue
+        item = dict(item, item_id=item_ids[query['item_id']],
+                    given_url=query['url'])
+        merge_item(links, item, query.get('title'),
+                   link.get('tags', {}).keys(), link['status'] == '1', now)
+        links[item['item_id']]['favorite'] = link.get('favorite', '0')
+    for item_id, new_id in item_ids.iteritems():
+        if new_id is None:
+            links.pop(item_id, None)
+
+
+def revert_rejected(links, batch, rejected):
+    '''
+    Reverts the local changes of the actions Pocket rejected, which no
+    later sync would undo as the items did not change on the server.
+    Returns the item_ids of the reverted items.
+
+    '''
+    first = {}
+    for i in reversed(rejected):
+        action = batch[i]
+        undo_action(links, action['query'], action.get('undo'))
+        first[action['query']['item_id']] = i
+
+    # Accepted actions that followed a rejected one are applied again
+    for i, action in enumerate(batch):
+        item_id = action['query']['item_id']
+        if i > first.get(item_id, i) and i not in rejected:
+            apply_action(links, action['query'])
+    return set(first)
+
+
+def dequeue(wf, count, item_ids=None):
+    # Only the background job removes actions, others just append to them
+    item_ids = item_ids or {}
+    with LockFile(wf.datafile('pocket_actions')):
+        actions = []
+        for action in (wf.stored_data('pocket_actions') or [])[count:]:
+            item_id = action['query']['item_id']
+            if item_id in item_ids:
+                if item_ids[item_id] is None:
+                    continue
+                action['query']['item_id'] = item_ids[item_id]
+            actions.append(action)
+        wf.store_data('pocket_actions', actions or None)
+
+
+def start_flush(wf):  # pragma: no cover
+    cmd = ['/usr/bin/python', wf.workflowfile('pocket_actions.py')]
+    run_in_background('pocket_actions', cmd)
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
@@ -1,6 +1,15 @@
 import workflow.web as requests
-import json
+import errno
+import httplib
+import random
+import socket
+import time
+from email.utils import mktime_tz, parsedate_tz
 from functools import wraps
+from multiprocessing.pool import ThreadPool
+from time import sleep
+from urllib2 import URLError
+from workflow import jsoncodec
 
 
 class PocketException(Exception):
@@ -38,6 +47,43 @@ EXCEPTIONS = {
     503: ServerMaintenanceException,
 }
 
+# Responses and socket errors that are worth retrying after a short delay
+TRANSIENT_STATUS_CODES = (500, 502, 503, 504)
+TRANSIENT_ERRNOS = (
+    errno.ECONNABORTED, errno.ECONNRESET, errno.EPIPE, errno.ETIMEDOUT,
+)
+
+
+def is_transient(error):
+    '''
+    Returns True if the request that raised error may succeed when retried
+
+    '''
+    if isinstance(error, PocketException):
+        return getattr(error, 'status_code', None) in TRANSIENT_STATUS_CODES
+    if isinstance(error, URLError):
+        error = error.reason
+    if isinstance(error, (socket.timeout, httplib.HTTPException)):
+        return True
+    return isinstance(error, socket.error) and error.errno in TRANSIENT_ERRNOS
+
+
+def parse_retry_after(value):
+    '''
+    Returns the delay in seconds requested by a Retry-After header, which
+    is either a number of seconds or an HTTP date
+
+    '''
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0, mktime_tz(date) - time.time())
+
 
 def method_wrapper(fn):
 
@@ -85,7 +131,7 @@ def bulk_wrapper(fn):
             payload.update(self.get_payload())
             return self.make_request(
                 url,
-                json.dumps(payload),
+                jsoncodec.dumps(payload),
                 headers={'content-type': 'application/json'},
             )
 
@@ -115,6 +161,17 @@ class Pocket(object):
         503: 'Pocket\'s sync server is down for scheduled maintenance.',
     }
 
+    # Transient errors are retried with exponential backoff and full jitter
+    # until either the attempts or the total deadline (in seconds) run out,
+    # no attempt waits for a response past the deadline
+    request_timeout = 20
+    # Keep-alive connections shared by all requests of this process
+    connection_pool = requests.ConnectionPool()
+    retry_attempts = 4
+    retry_backoff = 0.5
+    retry_backoff_max = 8
+    retry_deadline = 30
+
     def __init__(self, consumer_key, access_token):
         self.consumer_key = consumer_key
         self.access_token = access_token
@@ -131,24 +188,66 @@ class Pocket(object):
     def add_bulk_query(self, query):
         self._bulk_query.append(query)
 
-    @staticmethod
-    def _post_request(url, payload, headers):
-        r = requests.post(url, data=payload, headers=headers)
+    @classmethod
+    def _post_request(cls, url, payload, headers, timeout=None):
+        r = cls.connection_pool.post(url, data=payload, headers=headers,
+                                     timeout=timeout or cls.request_timeout)
         return r
 
     @classmethod
     def _make_request(cls, url, payload, headers=None):
-        r = cls._post_request(url, payload, headers)
+        started = time.time()
+        attempt = 0
+        while True:
+            remaining = cls.retry_deadline - (time.time() - started)
+            timeout = min(cls.request_timeout, max(remaining, 0.001))
+            try:
+                return cls._make_single_request(url, payload, headers,
+                                                timeout)
+            except (URLError, socket.error, httplib.HTTPException,
+                    PocketException) as e:
+                delay = cls._retry_delay(e, attempt, time.time() - started)
+                if delay is None:
+                    raise
+                attempt += 1
+                sleep(delay)
+
+    @classmethod
+    def _make_single_request(cls, url, payload, headers=None, timeout=None):
+        r = cls._post_request(url, payload, headers, timeout)
 
         if r.status_code > 399:
             error_msg = cls.statuses.get(r.status_code)
             extra_info = r.headers.get('X-Error')
-            raise EXCEPTIONS.get(r.status_code, PocketException)(
+            error = EXCEPTIONS.get(r.status_code, PocketException)(
                 '%s. %s' % (error_msg, extra_info)
             )
+            error.status_code = r.status_code
+            error.headers = r.headers
+            raise error
 
         return r.json() or r.text, r.headers
 
+    @classmethod
+    def _retry_delay(cls, error, attempt, elapsed):
+        '''
+        Returns the number of seconds to wait before retrying the request
+        that raised error or None if it should not be retried
+
+        '''
+        if attempt >= cls.retry_attempts or not is_transient(error):
+            return None
+
+        delay = parse_retry_after(
+            getattr(error, 'headers', {}).get('Retry-After'))
+        if delay is None:
+            delay = random.uniform(0, min(
+                cls.retry_backoff_max, cls.retry_backoff * 2 ** attempt))
+
+        if elapsed + delay > cls.retry_deadline:
+            return None
+        return delay
+
     @classmethod
     def make_request(cls, url, payload, headers=None):
         return cls._make_request(url, payload, headers)
@@ -167,7 +266,7 @@ class Pocket(object):
     def get(
         self, state=None, favorite=None, tag=None, contentType=None,
         sort=None, detailType=None, search=None, domain=None, since=None,
-        count=None, offset=None
+        count=None, offset=None, total=None
     ):
         '''
         This method allows you to retrieve a user's list. It supports
@@ -290,9 +389,9 @@ class Pocket(object):
         payload.update(self._payload)
         self._bulk_query = []
 
-        return self._make_request(
+        return self.make_request(
             url,
-            json.dumps(payload),
+            jsoncodec.dumps(payload),
             headers={'content-type': 'application/json'},
         )
 
@@ -364,3 +463,36 @@ class Pocket(object):
         )
 
         return cls.get_access_token(consumer_key, code)
+
+
+class AsyncPocket(Pocket):
+    '''
+    Pocket client with the same methods as Pocket that sends its requests
+    concurrently from a pool of worker threads. Instead of the response,
+    every request method returns an AsyncResult whose get() returns the
+    response or raises the same exceptions as Pocket.
+    The workflow runs on Python 2.7, which has no asyncio.
+
+    '''
+
+    def __init__(self, consumer_key, access_token, workers=4):
+        super(AsyncPocket, self).__init__(consumer_key, access_token)
+        self._pool = ThreadPool(workers)
+
+    def make_request(self, url, payload, headers=None):
+        return self._pool.apply_async(
+            self._make_request, (url, payload, headers))
+
+    def close(self):
+        '''
+        Waits for all pending requests and stops the worker threads
+
+        '''
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
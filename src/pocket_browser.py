@@ -0,0 +1,92 @@
+import os
+import subprocess
+import urlparse
+
+FRONTMOST_APP = """\
+osascript -e 'application (path to frontmost application as text)'\
+"""
+BROWSER_SCRIPTS = {
+    'Firefox': {
+        'url': """\
+osascript -e 'tell application "Firefox" to activate\n \
+  set old_clipboard to the clipboard\n \
+  tell application "System Events"\n \
+      repeat until (exists window 1 of process "Firefox") \n \
+        delay 0.1 \n \
+      end repeat\n \
+      keystroke "l" using command down\n \
+      keystroke "c" using command down\n \
+  end tell\n \
+  delay .5\n \
+  set new_clipboard to the clipboard\n \
+  set the clipboard to old_clipboard\n \
+  return new_clipboard' \
+""",
+        'title': """osascript -e 'tell application "Firefox" to return name of front window'"""
+    },
+    'Google Chrome': {
+        'url': """osascript -e 'tell application "Google Chrome" to return URL of active tab of front window'""",
+        'title': """osascript -e 'tell application "Google Chrome" to return title of active tab of front window'""",
+    },
+    'Google Chrome Canary': {
+        'url': """osascript -e 'tell application "Google Chrome Canary" to return URL of active tab of front window'""",
+        'title': """osascript -e 'tell application "Google Chrome Canary" to return title of active tab of front window'""",
+    },
+    'Chromium': {
+        'url': """osascript -e 'tell application "Chromium" to return URL of active tab of front window'""",
+        'title': """osascript -e 'tell application "Chromium" to return title of active tab of front window'""",
+    },
+    'Brave Browser': {
+        'url': """osascript -e 'tell application "Brave Browser" to return URL of active tab of front window'""",
+        'title': """osascript -e 'tell application "Brave Browser" to return title of active tab of front window'""",
+    },
+    'Vivaldi': {
+        'url': """osascript -e 'tell application "Vivaldi" to return URL of active tab of front window'""",
+        'title': """osascript -e 'tell application "Vivaldi" to return title of active tab of front window'""",
+    },
+    'Safari': {
+        'url': """osascript -e 'tell application "Safari" to return URL of front document'""",
+        'title': """osascript -e 'tell application "Safari" to return name of front document'""",
+    },
+    'Safari Technology Preview': {
+        'url': """osascript -e 'tell application "Safari Technology Preview" to return URL of front document'""",
+        'title': """osascript -e 'tell application "Safari Technology Preview" to return name of front document'""",
+    },
+    'Webkit': {
+        'url': """osascript -e 'tell application "Webkit" to return URL of front document'""",
+        'title': """osascript -e 'tell application "Webkit" to return name of front document'""",
+    },
+}
+
+
+def frontmost_app():
+    return os.popen(FRONTMOST_APP).readline().rstrip()
+
+
+def get_browser_link(browser):
+    scripts = BROWSER_SCRIPTS.get(browser)
+    if scripts is None:
+        return None
+    url = os.popen(scripts['url']).readline()
+    title = os.popen(scripts['title']).readline()
+    if url is None or title is None:
+        return None
+    return {
+        'url': url.strip('\n'),
+        'title': title.strip('\n')
+    }
+
+
+def get_link_from_clipboard():
+    p = subprocess.Popen(['pbpaste', 'r'],
+                         stdout=subprocess.PIPE, close_fds=True)
+    clipboard, stderr = p.communicate()
+    if stderr:
+        return None
+    parts = urlparse.urlsplit(clipboard)
+    if not parts.scheme or not parts.netloc:
+        return None
+    return {
+        'url': clipboard,
+        'title': None
+    }
@@ -0,0 +1,99 @@
+import time
+from contextlib import contextmanager
+from workflow.util import LockFile
+
+from pocket_index import (build_tag_index, build_url_filter,
+                          build_url_index, update_tag_model,
+                          url_index_outdated)
+
+
+@contextmanager
+def locked_links(wf):
+    '''
+    Yields the cached Pocket list, or None if there is none yet, while
+    holding the lock that serialises all updates of it
+
+    '''
+    with LockFile(wf.cachefile('pocket_list')):
+        # Include changes other processes made before we got the lock
+        wf.forget_cached_data('pocket_list')
+        yield wf.cached_data('pocket_list', max_age=0)
+
+
+def cache_links(wf, links, changed=None):
+    '''
+    Publishes the Pocket list together with the indexes derived from it.
+    changed holds the item_ids of the links that were added or removed or
+    whose URLs or tags changed since it was last published, or None if
+    that is not known.
+
+    '''
+    wf.cache_data('pocket_list', links)
+    cache_indexes(wf, links, changed)
+
+
+def cache_indexes(wf, links, changed=None):
+    '''
+    Updates the indexes derived from the Pocket list, only rebuilding
+    those the links whose item_id is in changed affect, all if it is None
+
+    '''
+    # Only the links that changed since the last update are counted, the
+    # model is rebuilt if the links it was counted from are not known
+    items = wf.cached_data('pocket_tag_items', max_age=0) or {}
+    model = items and wf.cached_data('pocket_tag_model', max_age=0) or {}
+    tagged = update_tag_model(model, items, links,
+                              changed if items else None)
+    if tagged or changed is None:
+        wf.cache_data('pocket_tag_model', model)
+        wf.cache_data('pocket_tag_items', items)
+        tag_index = build_tag_index(links)
+        wf.cache_data('pocket_tag_index', tag_index)
+        wf.cache_data('pocket_tags', [row[1] for row in tag_index])
+
+    if changed is None or url_index_outdated(
+            wf.cached_data('pocket_url_index', max_age=0), links, changed):
+        index = build_url_index(links)
+        wf.cache_data('pocket_url_index', index)
+        wf.cache_data('pocket_url_filter', build_url_filter(index))
+
+
+def merge_added_items(wf, added, archived=False):
+    '''
+    Adds the (item, title, tags) tuples of /v3/add or /v3/send add results
+    to the cached list, so that saving links does not require a full sync
+    to show them
+
+    '''
+    now = str(int(time.time()))
+    with locked_links(wf) as links:
+        # The first sync will fetch the links together with all others
+        if links is None:
+            return
+
+        for item, title, tags in added:
+            merge_item(links, item, title, tags, archived, now)
+        cache_links(wf, links, set(item['item_id'] for item, _, _ in added))
+
+
+def merge_item(links, item, title, tags, archived, now):
+    item_id = item['item_id']
+    tags = [t.decode('utf-8') if isinstance(t, str) else t for t in tags]
+
+    link = links.get(item_id)
+    if link is None:
+        link = dict(item)
+        link.update({
+            'given_url': item.get('given_url') or item.get('normal_url', ''),
+            'given_title': title or '',
+            'resolved_title': item.get('title') or title or '',
+            'favorite': '0',
+            'time_added': item.get('time_added') or now,
+            'tags': {},
+        })
+        links[item_id] = link
+
+    link['status'] = '1' if archived else '0'
+    link['time_updated'] = now
+    link.setdefault('tags', {}).update(
+        (t, {'item_id': item_id, 'tag': t}) for t in tags)
@@ -7,6 +7,14 @@ ERROR_MESSAGES = {
         'Could not connect to getpocket.com...',
         'Please check your Internet connection and try again!'
     ],
+    'ServerMaintenanceException': [
+        'Pocket is down for scheduled maintenance...',
+        'Your list will be refreshed once it is back!'
+    ],
+    'ActionError': [
+        'Some of your changes could not be saved to Pocket...',
+        'Please try again or file a bug report!'
+    ],
     'PocketException': [
         'Could not receive your Pocket list...',
         'Please try again or file a bug report!'
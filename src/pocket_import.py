@@ -0,0 +1,331 @@
+import argparse
+import codecs
+import csv
+import os
+import sys
+import urlparse
+from collections import deque
+from itertools import chain
+from HTMLParser import HTMLParser
+from urllib2 import URLError
+from pocket_api import (AsyncPocket, AuthException, PocketException,
+                        RateLimitException)
+from workflow import Workflow, PasswordNotFound
+
+from pocket_cache import merge_added_items
+from pocket_index import load_url_index, normalize_url
+from pocket_scheduler import record_local_write
+import config
+
+# Number of add actions sent with each /v3/send request
+BATCH_SIZE = 50
+# Number of /v3/send requests that may be in flight at the same time
+CONCURRENCY = 4
+READ_SIZE = 64 * 1024
+RESULT_FIELDS = ['url', 'result', 'item_id', 'error']
+# Errors after which the remaining links are not sent at all
+FATAL_ERRORS = (AuthException, RateLimitException)
+
+
+def main():
+    wf = Workflow()
+    wf.cache_serializer = config.CACHE_SERIALIZER
+    args = parse_args(wf.args)
+    tags = [t.strip().strip('#') for t in (args.tags or '').split(',')
+            if t.strip()]
+    results_path = args.results or wf.datafile('pocket_import.csv')
+
+    try:
+        access_token = wf.get_password('pocket_access_token')
+    except PasswordNotFound:
+        print 'Please log in to Pocket first.'
+        return
+
+    def progress(counts):
+        sys.stderr.write('%s\n' % format_counts(counts))
+
+    pocket = AsyncPocket(config.CONSUMER_KEY, access_token,
+                         workers=CONCURRENCY)
+    try:
+        with open(results_path, 'wb') as results:
+            counts = import_links(wf, pocket, read_links(args.path), tags,
+                                  results, progress)
+    finally:
+        pocket.close()
+
+    print '%s. Details in %s' % (format_counts(counts), results_path)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path')
+    parser.add_argument('--tags', dest='tags', default=None)
+    parser.add_argument('--results', dest='results', default=None)
+    return parser.parse_args(args)
+
+
+def format_counts(counts):
+    return ('%(added)d added, %(exists)d already saved, '
+            '%(duplicate)d duplicate, %(failed)d failed, %(invalid)d invalid, '
+            '%(skipped)d skipped' % counts)
+
+
+def read_links(path):
+    '''
+    Yields a dict with url, title, tags and time for every link in a
+    Netscape bookmark file, a CSV file or a text file with one URL per line
+
+    '''
+    with open(path, 'rb') as f:
+        head = f.read(1024)
+        f.seek(0)
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.html', '.htm') or '<a ' in head.lower():
+            links = read_bookmarks(f)
+        elif extension == '.csv':
+            links = read_csv(f)
+        else:
+            links = read_text(f)
+        for link in links:
+            yield link
+
+
+def read_bookmarks(f):
+    parser = BookmarkParser()
+    reader = codecs.getreader('utf-8')(f, errors='replace')
+    while True:
+        chunk = reader.read(READ_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        for link in parser.pop_links():
+            yield link
+    parser.close()
+    for link in parser.pop_links():
+        yield link
+
+
+class BookmarkParser(HTMLParser):
+    '''
+    Collects the links of a bookmark file as exported by browsers and
+    read-later services
+
+    '''
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self._links = []
+        self._link = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        attrs = dict(attrs)
+        if not attrs.get('href'):
+            return
+        self._link = {
+            'url': attrs['href'],
+            'title': '',
+            'tags': split_tags(attrs.get('tags')),
+            'time': attrs.get('add_date') or attrs.get('time_added'),
+        }
+        self._links.append(self._link)
+
+    def handle_data(self, data):
+        if self._link is not None:
+            self._link['title'] += data
+
+    def handle_entityref(self, name):
+        self.handle_data(self.unescape('&%s;' % name))
+
+    def handle_charref(self, name):
+        self.handle_data(self.unescape('&#%s;' % name))
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._link is not None:
+            self._link['title'] = self._link['title'].strip()
+            self._link = None
+
+    def pop_links(self):
+        # Keep the link that is still being read until its end tag
+        done = [l for l in self._links if l is not self._link]
+        self._links = [l for l in self._links if l is self._link]
+        return done
+
+
+def read_csv(f):
+    '''
+    Reads the url, title, tags and time_added columns of a CSV file with a
+    header row, or the first column that contains a URL without one
+
+    '''
+    rows = csv.reader(f)
+    first = next(rows, [])
+    header = [c.strip().lower() for c in first]
+    columns = dict((name, header.index(name)) for name in
+                   ['url', 'title', 'tags', 'time_added'] if name in header)
+
+    if 'url' not in columns:
+        # No header, so the first row is a link as well
+        rows = chain([first], rows)
+        columns = {}
+
+    for row in rows:
+        row = [c.decode('utf-8', 'replace') for c in row]
+        if 'url' in columns:
+            url = cell(row, columns['url'])
+        else:
+            url = next((c for c in row if clean_url(c)), '')
+        yield {
+            'url': url,
+            'title': cell(row, columns.get('title')),
+            'tags': split_tags(cell(row, columns.get('tags'))),
+            'time': cell(row, columns.get('time_added')) or None,
+        }
+
+
+def cell(row, column):
+    if column is None or column >= len(row):
+        return ''
+    return row[column].strip()
+
+
+def read_text(f):
+    for line in codecs.getreader('utf-8')(f, errors='replace'):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield {'url': line.split()[0], 'title': '', 'tags': [],
+                   'time': None}
+
+
+def split_tags(tags):
+    # Pocket exports separate tags with "|", browsers with ","
+    return [t.strip() for t in (tags or '').replace('|', ',').split(',')
+            if t.strip()]
+
+
+def clean_url(url):
+    '''
+    Returns the URL without surrounding whitespace and quotes and with a
+    lowercase scheme and host, or None if it is not a web URL
+
+    '''
+    url = url.strip().strip('<>"\'')
+    parts = urlparse.urlsplit(url)
+    if parts.scheme.lower() not in ('http', 'https') or not parts.netloc:
+        return None
+    return urlparse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                                parts.path, parts.query, parts.fragment))
+
+
+def import_links(wf, pocket, links, tags=None, results=None,
+                 progress=None):
+    '''
+    Adds the given links to Pocket with /v3/send add actions in batches of
+    BATCH_SIZE, keeping at most CONCURRENCY requests in flight. Links
+    that are already in the cached list or appear twice are skipped.
+    Writes one CSV row per link to results and returns the number of
+    links per result.
+
+    '''
+    index = load_url_index(wf)
+    seen = set()
+    counts = dict((name, 0) for name in
+                  ['added', 'exists', 'duplicate', 'failed', 'invalid',
+                   'skipped'])
+    writer = csv.writer(results) if results is not None else None
+    if writer:
+        writer.writerow(RESULT_FIELDS)
+    pending = deque()
+    added = []
+    state = {'fatal': None}
+    tags = list(tags or [])
+
+    def record(link, result, item_id='', error=''):
+        counts[result] += 1
+        if writer:
+            writer.writerow([link['url'].encode('utf-8'), result,
+                             item_id, error])
+
+    def send(batch):
+        for link in batch:
+            query = {
+                'action': 'add',
+                'url': link['url'],
+                'tags': ','.join(link['tags'] + tags),
+            }
+            for name in ['title', 'time']:
+                if link.get(name):
+                    query[name] = link[name]
+            pocket.add_bulk_query(query)
+        pending.append((pocket.commit(), batch))
+
+    def receive():
+        result, batch = pending.popleft()
+        try:
+            action_results = result.get()[0].get('action_results') or []
+            error = 'Pocket did not add this link'
+        except (URLError, PocketException), e:
+            action_results = []
+            error = type(e).__name__
+            if isinstance(e, FATAL_ERRORS):
+                state['fatal'] = error
+
+        for i, link in enumerate(batch):
+            item = action_results[i] if i < len(action_results) else None
+            if isinstance(item, dict) and item.get('item_id'):
+                record(link, 'added', item['item_id'])
+                item = dict(item, given_url=item.get('given_url') or
+                            link['url'])
+                # Keep the date the link was bookmarked, as sent in time
+                if link.get('time'):
+                    item['time_added'] = link['time']
+                added.append((item, link['title'], link['tags'] + tags))
+            else:
+                record(link, 'failed', error=error)
+        if progress:
+            progress(counts)
+
+    batch = []
+    for link in links:
+        url = clean_url(link['url'])
+        if url is None:
+            record(link, 'invalid')
+            continue
+        key = normalize_url(url)
+        if key in index:
+            record(link, 'exists', index[key])
+            continue
+        if key in seen:
+            record(link, 'duplicate')
+            continue
+        seen.add(key)
+
+        if state['fatal']:
+            record(link, 'skipped', error=state['fatal'])
+            continue
+
+        batch.append(dict(link, url=url))
+        if len(batch) == BATCH_SIZE:
+            send(batch)
+            batch = []
+            # Wait for the oldest request once all workers are busy
+            if len(pending) >= CONCURRENCY:
+                receive()
+
+    if batch and not state['fatal']:
+        send(batch)
+    elif batch:
+        for link in batch:
+            record(link, 'skipped', error=state['fatal'])
+    while pending:
+        receive()
+
+    if added:
+        merge_added_items(wf, added)
+        record_local_write(wf)
+    return counts
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
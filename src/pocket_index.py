@@ -0,0 +1,268 @@
+import bisect
+import hashlib
+import heapq
+import math
+import struct
+import urlparse
+
+# False positive rate of the URL filter, each one costs a lookup in the
+# URL index
+BLOOM_ERROR_RATE = 0.01
+
+
+def normalize_url(url):
+    '''
+    Returns the key under which a URL is indexed, so that http and https,
+    host case and a trailing slash do not matter
+
+    '''
+    parts = urlparse.urlsplit(url.strip())
+    if not parts.netloc:
+        return url.strip()
+    key = parts.netloc.lower() + parts.path.rstrip('/')
+    if parts.query:
+        key += '?' + parts.query
+    return key
+
+
+def build_url_index(links):
+    '''
+    Maps the given and resolved URL of every link to its item_id
+
+    '''
+    index = {}
+    for item_id, link in links.iteritems():
+        if link.get('resolved_url'):
+            index[normalize_url(link['resolved_url'])] = link.get(
+                'item_id', item_id)
+    # The URL a link was saved with wins over another link's resolved URL
+    for item_id, link in links.iteritems():
+        if link.get('given_url'):
+            index[normalize_url(link['given_url'])] = link.get(
+                'item_id', item_id)
+    return index
+
+
+def load_url_index(wf):
+    '''
+    Returns the cached URL index, built from the cached list if an older
+    version of the workflow did not write one
+
+    '''
+    index = wf.cached_data('pocket_url_index', max_age=0)
+    if index is None:
+        index = build_url_index(wf.cached_data('pocket_list', max_age=0) or {})
+    return index
+
+
+class BloomFilter(object):
+    '''
+    Set of strings that may report false positives but never false
+    negatives, in a small fraction of the space of the strings themselves
+
+    '''
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(bits or (num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(capacity, 1)
+        num_bits = int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        num_hashes = max(1, int(round(
+            float(num_bits) / capacity * math.log(2))))
+        return cls(max(num_bits, 64), num_hashes)
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    def _positions(self, key):
+        # Double hashing, see Kirsch and Mitzenmacher, "Less Hashing, Same
+        # Performance: Building a Better Bloom Filter". 32 bit halves keep
+        # the arithmetic in machine ints.
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        digest = hashlib.md5(key).digest()
+        h1, h2 = struct.unpack('<II8x', digest)
+        return [(h1 + i * h2) % self.num_bits
+                for i in xrange(self.num_hashes)]
+
+    def state(self):
+        return self.num_bits, self.num_hashes, str(self.bits)
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+
+def build_url_filter(index):
+    '''
+    Returns the state of a BloomFilter of all keys of the URL index
+
+    '''
+    bloom = BloomFilter.for_capacity(len(index))
+    for key in index:
+        bloom.add(key)
+    return bloom.state()
+
+
+def find_saved_item(wf, url):
+    '''
+    Returns the item_id of the link with the given URL if it is in the
+    cached list, only loading the URL index if the filter contains it
+
+    '''
+    state = wf.cached_data('pocket_url_filter', max_age=0)
+    key = normalize_url(url)
+    if state is None or key not in BloomFilter.from_state(state):
+        return None
+    return load_url_index(wf).get(key)
+
+
+def build_tag_index(links):
+    '''
+    Returns the tags of all links as a sorted list of (key, tag, count,
+    last_used) rows, where key is the lowercase tag prefixes are looked
+    up by and last_used the newest time_updated of a link with the tag
+
+    '''
+    usage = {}
+    for link in links.itervalues():
+        used = int(link.get('time_updated') or link.get('time_added') or 0)
+        for tag in link.get('tags') or {}:
+            count, last_used = usage.get(tag, (0, 0))
+            usage[tag] = (count + 1, max(last_used, used))
+    return sorted((tag.lower(), tag, count, last_used)
+                  for tag, (count, last_used) in usage.iteritems())
+
+
+def load_tag_index(wf):
+    '''
+    Returns the cached tag index, built from the cached list if an older
+    version of the workflow did not write one
+
+    '''
+    index = wf.cached_data('pocket_tag_index', max_age=0)
+    if index is None:
+        index = build_tag_index(wf.cached_data('pocket_list', max_age=0) or {})
+    return index
+
+
+def complete_tags(index, partial, limit, exclude=(), scores=None):
+    '''
+    Returns up to limit tags that start with the partial tag, ignoring
+    case, ranked by their score, then how many links use them and then
+    when they were last used. Tags whose key is in exclude are skipped.
+
+    '''
+    prefix = partial.strip().lstrip('#').lower()
+    if isinstance(prefix, str):
+        prefix = prefix.decode('utf-8')
+    start = bisect.bisect_left(index, (prefix,))
+    end = bisect.bisect_left(index, (prefix + u'\uffff',), start)
+    matches = (row for row in index[start:end] if row[0] not in exclude)
+    scores = scores or {}
+    return [row[1] for row in heapq.nlargest(
+        limit, matches, key=lambda row: (scores.get(row[1], 0),) + row[2:])]
+
+
+def url_domain(url):
+    netloc = urlparse.urlsplit(url.strip()).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+def update_tag_model(model, items, links, changed=None):
+    '''
+    Updates the model of which tags are used together and on which
+    domains with the links that were added, changed or removed since the
+    last update. items maps the item_id of every tagged link to the URL
+    and tags it was counted with and is updated as well. Only the links
+    whose item_id is in changed are looked at, all if it is None. Returns
+    whether the tags of any link changed.
+
+    '''
+    if changed is None:
+        changed = set(items).union(links)
+
+    modified = False
+    for item_id in changed:
+        link = links.get(item_id) or {}
+        tags = sorted(link.get('tags') or ())
+        entry = (link.get('given_url', ''), tags) if tags else None
+        counted = items.get(item_id)
+        if counted == entry:
+            continue
+        modified = True
+        if counted:
+            count_tags(model, counted, -1)
+        if entry:
+            count_tags(model, entry, 1)
+            items[item_id] = entry
+        else:
+            del items[item_id]
+    return modified
+
+
+def url_index_outdated(index, links, changed):
+    '''
+    Returns whether the URL index misses the URLs of a link whose item_id
+    is in changed or still lists one that was removed
+
+    '''
+    if index is None:
+        return True
+    for item_id in changed:
+        link = links.get(item_id)
+        if link is None:
+            return True
+        for url in (link.get('given_url'), link.get('resolved_url')):
+            if url and index.get(normalize_url(url)) != link.get(
+                    'item_id', item_id):
+                return True
+    return False
+
+
+def count_tags(model, entry, delta):
+    url, tags = entry
+    domain = url_domain(url)
+    for tag in tags:
+        if domain:
+            adjust(model.setdefault('domains', {}), domain, tag, delta)
+        for other in tags:
+            if other != tag:
+                adjust(model.setdefault('pairs', {}), tag, other, delta)
+
+
+def adjust(table, key, tag, delta):
+    counts = table.setdefault(key, {})
+    count = counts.get(tag, 0) + delta
+    if count > 0:
+        counts[tag] = count
+        return
+    counts.pop(tag, None)
+    if not counts:
+        del table[key]
+
+
+def tag_scores(model, tags, domain=None):
+    '''
+    Returns how often each tag was used together with the given tags and
+    on links of the given domain, only looking at the rows of these
+
+    '''
+    rows = [model.get('pairs', {}).get(tag, {}) for tag in tags]
+    if domain:
+        rows.append(model.get('domains', {}).get(domain, {}))
+    scores = {}
+    for row in rows:
+        for tag, count in row.iteritems():
+            scores[tag] = scores.get(tag, 0) + count
+    return scores
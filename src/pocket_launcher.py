@@ -1,14 +1,22 @@
 import argparse
 import os
+import re
 import subprocess
-from pocket_api import Pocket, PocketException
 from pocket import refresh_list
+from pocket_actions import is_pending, queue_actions
+from pocket_index import load_url_index, normalize_url
+from pocket_scheduler import record_local_write
 from workflow import Workflow
-
 import config
 
 WF = Workflow()
+WF.cache_serializer = config.CACHE_SERIALIZER
 POCKET_URL = 'https://app.getpocket.com/read/%s'
+ACTION_MESSAGES = {
+    'archive': 'archived',
+    'favorite': 'favorited',
+    'delete': 'deleted',
+}
 
 
 def execute():
@@ -18,38 +26,64 @@ def execute():
         print "No argument provided"
         return 0
 
-    url = args.query
+    urls = split_urls(args.query)
 
     if args.visit_archive:
-        subprocess.call(['open', url])
+        subprocess.call(['open'] + urls)
         refresh_list()
-        print archive_item(url)
+        print run_action('archive', urls)
     elif args.archive:
         refresh_list()
-        print archive_item(url)
+        print run_action('archive', urls)
         open_alfred()
     elif args.favorite:
         refresh_list()
-        print favorite_item(url)
+        print run_action('favorite', urls)
         open_alfred()
     elif args.delete:
         refresh_list()
-        print delete_item(url)
+        print run_action('delete', urls)
         open_alfred()
     elif args.website:
-        subprocess.call(['open', POCKET_URL % get_id(url)])
+        # Links that are still being saved have no page on Pocket yet
+        item_ids = [i for i in get_ids(urls) if i and not is_pending(i)]
+        if item_ids:
+            subprocess.call(['open'] + [POCKET_URL % i for i in item_ids])
     else:
         print "An error occured"
 
 
-def get_id(url):
-    links = WF.cached_data('pocket_list', max_age=0)
-    if links is None:
-        return None
-    for link in links.values():
-        if url == link['given_url']:
-            return link['item_id']
-    return None
+def split_urls(query):
+    '''
+    Returns the URLs of all selected items, which Alfred separates by
+    tabs when passing on a file buffer selection
+
+    '''
+    urls = [u.strip() for u in re.split(r'[\t\r\n]+', query)]
+    return [u for u in urls if u] or [query]
+
+
+def get_ids(urls):
+    '''
+    Returns the item_id of every URL, None for those that are unknown
+
+    '''
+    # The script filter passes the selected item's id as a variable, but
+    # older Alfred configurations and other triggers only pass the URL
+    item_id = os.getenv('item_id')
+    given_url = normalize_url(os.getenv('given_url', ''))
+
+    index = None
+    item_ids = []
+    for url in urls:
+        key = normalize_url(url)
+        if item_id and key == given_url:
+            item_ids.append(item_id)
+            continue
+        if index is None:
+            index = load_url_index(WF)
+        item_ids.append(index.get(key))
+    return item_ids
 
 
 def parse_args(args):
@@ -68,53 +102,25 @@ def parse_args(args):
     return parser.parse_args(args)
 
 
-def archive_item(url):
-    item_id = get_id(url)
-    if not item_id:
-        return '"item_id" not found'
-    access_token = WF.get_password('pocket_access_token')
-    pocket_instance = Pocket(config.CONSUMER_KEY, access_token)
-    try:
-        pocket_instance.archive(item_id, wait=False)
-        remove_from_cache(item_id)
-        return 'Link archived'
-    except PocketException:
-        return 'Connection error'
-
-
-def favorite_item(url):
-    item_id = get_id(url)
-    if not item_id:
-        return '"item_id" not found'
-    access_token = WF.get_password('pocket_access_token')
-    pocket_instance = Pocket(config.CONSUMER_KEY, access_token)
-    try:
-        pocket_instance.favorite(item_id, wait=False)
-        return 'Link favorited'
-    except PocketException:
-        return 'Connection error'
-
-
-def delete_item(url):
-    item_id = get_id(url)
-    if not item_id:
+def run_action(action, urls):
+    '''
+    Queues the action for all given links, so that it is sent with a
+    single request, and returns the message to notify the user with
+
+    '''
+    item_ids = [i for i in get_ids(urls) if i]
+    if not item_ids:
         return '"item_id" not found'
-    access_token = WF.get_password('pocket_access_token')
-    pocket_instance = Pocket(config.CONSUMER_KEY, access_token)
-    try:
-        pocket_instance.delete(item_id, wait=False)
-        remove_from_cache(item_id)
-        return 'Link deleted'
-    except PocketException:
-        return 'Connection error'
-
-
-def remove_from_cache(item_id):
-    # remove entry in cache
-    links = WF.cached_data('pocket_list', max_age=0)
-    if type(links) is dict and item_id in links:
-        del links[item_id]
-        WF.cache_data('pocket_list', links)
+    queue_actions(WF, [{'action': action, 'item_id': i} for i in item_ids])
+    record_local_write(WF)
+
+    done = ACTION_MESSAGES[action]
+    if len(urls) == 1:
+        return 'Link %s' % done
+    message = '%d links %s' % (len(item_ids), done)
+    if len(item_ids) < len(urls):
+        message += ', %d not found' % (len(urls) - len(item_ids))
+    return message
 
 
 def open_alfred():
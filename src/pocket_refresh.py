@@ -1,53 +1,37 @@
+import argparse
+import os
+import sys
+import time
 from urllib2 import URLError
 from pocket_api import Pocket, AuthException, PocketException
 from workflow import Workflow, PasswordNotFound
+from workflow.background import run_in_background
 
+from pocket_actions import apply_pending, has_pending, start_flush
+from pocket_cache import locked_links, cache_indexes, cache_links
+from pocket_scheduler import record_refresh
 import config
 
 LINK_LIMIT = 2000
+# Niceness of the background job that backfills complete item details
+BACKFILL_NICENESS = 10
 
 
-def main():
+def main(backfill=False):
     wf = Workflow()
+    wf.cache_serializer = config.CACHE_SERIALIZER
     error = None
+    changes = 0
+    started = time.time()
     try:
         # initialize client
         access_token = wf.get_password('pocket_access_token')
         pocket_instance = Pocket(config.CONSUMER_KEY, access_token)
 
-        since = wf.cached_data('pocket_since', max_age=0) or 0
-        links = wf.cached_data('pocket_list', max_age=0) or {}
-
-        next_since = 0
-        offset = 0
-        while True:
-            get = pocket_instance.get(
-                detailType='complete',
-                since=since,
-                state='all',
-                count=LINK_LIMIT,
-                offset=offset
-            )[0]
-
-            data = get['list']
-            next_since = get['since']
-
-            if get['status'] != 1 or len(data) == 0:
-                break
-
-            links.update(data)
-            offset += LINK_LIMIT
-
-        # Delete obsolete entries
-        for item_id in links.keys():
-            if links[item_id]['status'] == '2':
-                del links[item_id]
-
-        wf.cache_data('pocket_since', next_since)
-        wf.cache_data('pocket_list', links)
-        tags = list(set([t for l in links.values() if 'tags' in l
-                        for t in l['tags'].keys()]))
-        wf.cache_data('pocket_tags', tags)
+        if backfill:
+            backfill_details(wf, pocket_instance)
+        else:
+            changes = sync(wf, pocket_instance)
 
     except (AuthException, URLError, PocketException, PasswordNotFound), e:
         error = type(e).__name__
@@ -63,6 +47,224 @@ def main():
         # delete error file if it exists
         wf.cache_data('pocket_error', None)
 
+    # Failed syncs count as quiet ones so that the schedule backs off
+    if not backfill:
+        record_refresh(wf, changes, time.time() - started)
+
+
+def sync(wf, pocket_instance):
+    # Resume an interrupted sync at the last page that was merged
+    checkpoint = wf.cached_data('pocket_checkpoint', max_age=0)
+    if checkpoint:
+        since = checkpoint['since']
+        detail_type = checkpoint['detail_type']
+        next_since = checkpoint['next_since']
+        offset = resume_offset(pocket_instance, since, checkpoint['offset'],
+                               checkpoint.get('last_item'))
+        wf.logger.debug('resuming sync at offset %d', offset)
+    else:
+        since = wf.cached_data('pocket_since', max_age=0) or 0
+        # A fresh install first fetches only what the script filter needs,
+        # complete details are backfilled by a separate background job
+        detail_type = 'complete' if since else 'simple'
+        offset = 0
+        next_since = None
+
+    changes = 0
+    try:
+        for page, page_since, total in fetch_pages(
+                pocket_instance, since, detail_type, offset):
+            # The first page's since also covers changes made during the sync
+            if next_since is None:
+                next_since = page_since
+            if not page:
+                continue
+
+            merge_page(wf, page)
+            changes += len(page)
+            fetched = offset + len(page)
+            offset += LINK_LIMIT
+            wf.cache_data('pocket_checkpoint', {
+                'since': since,
+                'detail_type': detail_type,
+                'offset': offset,
+                'next_since': next_since,
+                'last_item': last_item(page),
+            })
+
+            # Let the script filter show the progress of long syncs
+            if total and fetched < total:
+                wf.cache_data('pocket_sync_status', {
+                    'fetched': fetched,
+                    'total': total,
+                })
+    finally:
+        # Don't leave the progress of a failed sync in the script filter
+        wf.cache_data('pocket_sync_status', None)
+        if changes:
+            update_indexes(wf)
+
+    # Make sure the script filter stops waiting for an empty account
+    if not since and offset == 0:
+        cache_links(wf, {})
+
+    wf.cache_data('pocket_since', next_since)
+    wf.cache_data('pocket_checkpoint', None)
+
+    if detail_type == 'simple':
+        wf.cache_data('pocket_backfill', {'offset': 0})
+    if wf.cached_data('pocket_backfill', max_age=0):
+        start_backfill(wf)
+    # Retry local changes that could not be sent so far
+    if has_pending(wf):
+        start_flush(wf)
+
+    return changes
+
+
+def merge_page(wf, page):
+    with locked_links(wf) as links:
+        links = links or {}
+        links.update(page)
+
+        # Delete obsolete entries
+        for item_id, item in page.iteritems():
+            if item['status'] == '2':
+                del links[item_id]
+
+        # Keep local changes that have not been sent yet
+        apply_pending(wf, links, page)
+        # The indexes are updated once all pages are merged
+        wf.cache_data('pocket_list', links)
+
+
+def update_indexes(wf):
+    with locked_links(wf) as links:
+        cache_indexes(wf, links or {})
+
+
+def backfill_details(wf, pocket_instance):
+    os.nice(BACKFILL_NICENESS)
+
+    # Resume an interrupted backfill at the last page that was merged
+    checkpoint = wf.cached_data('pocket_backfill', max_age=0) or {}
+    offset = resume_offset(pocket_instance, 0, checkpoint.get('offset', 0),
+                           checkpoint.get('last_item'))
+    merged = False
+    try:
+        for page, _, _ in fetch_pages(pocket_instance, 0, 'complete',
+                                      offset):
+            if not page:
+                continue
+
+            with locked_links(wf) as links:
+                links = links or {}
+                for item_id, item in page.iteritems():
+                    # Skip items that were removed or changed by a newer sync
+                    if (item_id not in links or
+                            int(links[item_id].get('time_updated', 0)) >
+                            int(item.get('time_updated', 0))):
+                        continue
+                    links[item_id] = item
+                apply_pending(wf, links, page)
+                wf.cache_data('pocket_list', links)
+            merged = True
+            offset += LINK_LIMIT
+            wf.cache_data('pocket_backfill', {
+                'offset': offset,
+                'last_item': last_item(page),
+            })
+    finally:
+        if merged:
+            update_indexes(wf)
+
+    wf.cache_data('pocket_backfill', None)
+
+
+def last_item(page):
+    '''
+    Returns the item_id of the oldest item of a page, or None if it has
+    no item that tells when it was added
+
+    '''
+    added = [(int(item['time_added']), item_id)
+             for item_id, item in page.iteritems() if item.get('time_added')]
+    return min(added)[1] if added else None
+
+
+def resume_offset(pocket_instance, since, offset, last_item):
+    '''
+    Returns the offset at which the items after last_item are listed now.
+    Items deleted since it was merged move the ones after it up, which
+    would otherwise be skipped. Returns 0 to start over if last_item is
+    not within the page before offset anymore.
+
+    '''
+    if not offset or last_item is None:
+        return offset
+
+    start = max(offset - LINK_LIMIT, 0)
+    items = pocket_instance.get(
+        detailType='simple',
+        since=since,
+        state='all',
+        sort='newest',
+        count=offset - start,
+        offset=start
+    )[0]['list'] or {}
+
+    last = items.get(last_item)
+    if last is None:
+        return 0
+    # Items added at the same time may be listed in any order, fetching
+    # some of them again is better than skipping one
+    added = int(last['time_added'])
+    behind = sum(1 for item_id, item in items.iteritems()
+                 if item_id != last_item and
+                 int(item.get('time_added') or 0) <= added)
+    return offset - behind
+
+
+def fetch_pages(pocket_instance, since, detail_type, offset=0):
+    '''
+    Yields each page of items changed since the given time, newest first,
+    together with the since value and the total number of changed items
+
+    '''
+    while True:
+        get = pocket_instance.get(
+            detailType=detail_type,
+            since=since,
+            state='all',
+            sort='newest',
+            count=LINK_LIMIT,
+            offset=offset,
+            total='1'
+        )[0]
+
+        data = get['list']
+        total = int(get.get('total') or 0)
+
+        if get['status'] != 1 or len(data) == 0:
+            yield {}, get['since'], total
+            break
+
+        yield data, get['since'], total
+        offset += LINK_LIMIT
+
+
+def start_backfill(wf):  # pragma: no cover
+    cmd = ['/usr/bin/python', wf.workflowfile('pocket_refresh.py'),
+           '--backfill']
+    run_in_background('pocket_backfill', cmd)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backfill', dest='backfill', action='store_true',
+                        default=False)
+    return parser.parse_args(args)
+
 
 if __name__ == '__main__':
-    main()  # pragma: no cover
+    main(parse_args(sys.argv[1:]).backfill)  # pragma: no cover
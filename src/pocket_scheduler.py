@@ -0,0 +1,76 @@
+import time
+
+# Bounds of the interval between two background refreshes in seconds
+MIN_INTERVAL = 10
+MAX_INTERVAL = 600
+# Never refresh more often than this multiple of the average sync duration
+DURATION_FACTOR = 5
+# Weight of the latest sync in the moving averages
+WEIGHT = 0.3
+
+
+def refresh_due(wf):
+    '''
+    Returns True if the Pocket list should be refreshed in the background
+
+    '''
+    schedule = wf.cached_data('pocket_schedule', max_age=0)
+    if not schedule:
+        wf.logger.debug('refresh due: no sync recorded yet')
+        return True
+
+    age = time.time() - schedule['last_refresh']
+    due = age >= schedule['interval']
+    wf.logger.debug(
+        'refresh %s: last sync %ds ago, interval %ds, change rate %.2f',
+        'due' if due else 'skipped', age, schedule['interval'],
+        schedule['change_rate'])
+    return due
+
+
+def record_refresh(wf, changes, duration):
+    '''
+    Updates the schedule with the number of changed items and the duration
+    of a finished sync and derives the interval until the next one
+
+    '''
+    schedule = wf.cached_data('pocket_schedule', max_age=0) or {
+        'change_rate': 1.0,
+        'duration': duration,
+    }
+
+    changed = 1.0 if changes else 0.0
+    change_rate = (1 - WEIGHT) * schedule['change_rate'] + WEIGHT * changed
+    duration = (1 - WEIGHT) * schedule['duration'] + WEIGHT * duration
+
+    # Busy accounts are refreshed every MIN_INTERVAL seconds, quiet ones
+    # back off towards MAX_INTERVAL as their change rate decays
+    interval = MIN_INTERVAL / max(change_rate, float(MIN_INTERVAL) /
+                                  MAX_INTERVAL)
+    interval = max(interval, duration * DURATION_FACTOR)
+
+    wf.cache_data('pocket_schedule', {
+        'last_refresh': time.time(),
+        'interval': interval,
+        'change_rate': change_rate,
+        'duration': duration,
+    })
+    wf.logger.info(
+        'sync changed %d items in %.1fs, change rate %.2f, next sync in %ds',
+        changes, duration, change_rate, interval)
+
+
+def record_local_write(wf):
+    '''
+    Tightens the schedule after a local change such as a save or an archive
+    so that the next keystroke picks up the server's version
+
+    '''
+    schedule = wf.cached_data('pocket_schedule', max_age=0)
+    if not schedule:
+        return
+
+    schedule['change_rate'] = 1.0
+    schedule['interval'] = MIN_INTERVAL
+    wf.cache_data('pocket_schedule', schedule)
+    wf.logger.info('local write, next sync in %ds', MIN_INTERVAL)
@@ -1,9 +1,23 @@
 import argparse
+import os
 from workflow import Workflow
 
+from pocket_index import (complete_tags, load_tag_index, tag_scores,
+                          url_domain)
+from pocket_browser import (BROWSER_SCRIPTS, frontmost_app,
+                            get_link_from_clipboard)
+import config
+
+# Number of tags suggested for the tag being typed
+COMPLETION_LIMIT = 20
+# Seconds the domain of the link being saved is reused for, so that it is
+# only looked up once while typing the tags
+DOMAIN_MAX_AGE = 30
+
 
 def main():
     wf = Workflow()
+    wf.cache_serializer = config.CACHE_SERIALIZER
 
     args = parse_args(wf.args)
 
@@ -13,19 +27,47 @@ def main():
 
     wf.add_item(title, arg=args.query, valid=True)
 
-    tags = wf.cached_data('pocket_tags', max_age=0)
-    if tags:
-        for tag in tags:
-            if args.query:
-                autocomplete = '%s, #%s' % (args.query, tag)
-            else:
-                autocomplete = '#%s' % tag
-            wf.add_item(' > Add #%s' % tag,
-                        autocomplete=autocomplete,
-                        valid=False)
+    # Complete the tag after the last comma, keeping the ones before it
+    parts = (args.query or '').split(',')
+    entered = [p.strip() for p in parts[:-1] if p.strip().strip('#')]
+    exclude = set(p.lstrip('#').lower() for p in entered)
+
+    # Prefer tags used together with the entered ones and on the domain
+    model = wf.cached_data('pocket_tag_model', max_age=0) or {}
+    scores = tag_scores(model, [p.lstrip('#') for p in entered],
+                        current_domain(wf))
+
+    for tag in complete_tags(load_tag_index(wf), parts[-1],
+                             COMPLETION_LIMIT, exclude, scores):
+        wf.add_item(' > Add #%s' % tag,
+                    autocomplete=', '.join(entered + ['#%s' % tag]),
+                    valid=False)
     wf.send_feedback()
 
 
+def current_domain(wf):
+    return wf.cached_data('pocket_current_domain', link_domain,
+                          max_age=DOMAIN_MAX_AGE)
+
+
+def link_domain():
+    '''
+    Returns the domain of the link pocket_save would save, or an empty
+    string if there is none
+
+    '''
+    app = frontmost_app()
+    if app == 'Firefox':
+        # Reading the URL activates Firefox, which would close Alfred
+        return ''
+    elif app in BROWSER_SCRIPTS:
+        url = os.popen(BROWSER_SCRIPTS[app]['url']).readline()
+    else:
+        link = get_link_from_clipboard()
+        url = link['url'] if link else ''
+    return url_domain(url)
+
+
 def parse_args(args):
     parser = argparse.ArgumentParser()
     parser.add_argument('--add-and-archive', dest='add_archive',
@@ -0,0 +1,282 @@
+import logging
+import unittest
+from urllib2 import URLError
+
+import pocket_actions
+import test_data
+from pocket_api import Pocket, InvalidQueryException
+from workflow import Workflow
+
+CachedData = {}
+StoredData = {}
+Commits = []
+Results = []
+
+
+class FakePocket(Pocket):
+
+    def commit(self):
+        Commits.append(self._bulk_query)
+        self._bulk_query = []
+        results = Results.pop(0) if Results else [True] * len(Commits[-1])
+        if isinstance(results, Exception):
+            raise results
+        return {'status': 1, 'action_results': results}, {}
+
+
+class PocketActionsTestCase(unittest.TestCase):
+
+    def test_queue_single_actions(self):
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'archive', 'item_id': '1'}])
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'tags_add', 'item_id': '2', 'tags': 'a,b'}])
+        self.assertEquals(len(self.flushes), 2)
+        self.assertEquals(
+            [a['query'] for a in StoredData['pocket_actions']],
+            [{'action': 'archive', 'item_id': '1'},
+             {'action': 'tags_add', 'item_id': '2', 'tags': 'a,b'}])
+
+    def test_queue_actions(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'archive', 'item_id': u'1'},
+            {'action': 'archive', 'item_id': u'2'},
+        ])
+        self.assertEquals(len(self.flushes), 1)
+        self.assertEquals(len(StoredData['pocket_actions']), 2)
+        links = CachedData['pocket_list']
+        self.assertEquals([links[u'1']['status'], links[u'2']['status']],
+                          ['1', '1'])
+
+    def test_coalesce(self):
+        for item_id in ['1', '2', '3']:
+            pocket_actions.queue_actions(
+                self.wf, [{'action': 'archive', 'item_id': item_id}])
+        pocket_actions.main()
+
+        # Waited for the coalescing window, then sent everything at once
+        self.assertTrue(len(self.sleeps) > 0)
+        self.assertEquals(len(Commits), 1)
+        self.assertEquals([q['item_id'] for q in Commits[0]],
+                          ['1', '2', '3'])
+        self.assertEquals(StoredData.get('pocket_actions'), None)
+
+    def test_batch_size(self):
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'favorite', 'item_id': str(item_id)}
+            for item_id in range(pocket_actions.BATCH_SIZE + 1)])
+        pocket_actions.main()
+
+        self.assertEquals([len(c) for c in Commits],
+                          [pocket_actions.BATCH_SIZE, 1])
+
+    def test_failed_actions(self):
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'archive', 'item_id': '1'},
+            {'action': 'delete', 'item_id': '2'},
+        ])
+        Results.append([True, False])
+        pocket_actions.main()
+
+        self.assertEquals(CachedData['pocket_error'], 'ActionError')
+        self.assertEquals(StoredData.get('pocket_actions'), None)
+
+    def test_revert_rejected_actions(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'archive', 'item_id': u'2'},
+            {'action': 'tags_add', 'item_id': u'2', 'tags': 'new'},
+            {'action': 'delete', 'item_id': u'1'},
+            {'action': 'favorite', 'item_id': u'300'},
+        ])
+        Results.append([False, True, False, True])
+        pocket_actions.main()
+
+        # The server items did not change, so no sync would revert them
+        links = CachedData['pocket_list']
+        self.assertEquals(links[u'2']['status'], '0')
+        self.assertEquals(sorted(links[u'2']['tags']), ['foo', 'new'])
+        self.assertEquals(links[u'1'], test_data.get_normal()[u'1'])
+        self.assertEquals(links[u'300']['favorite'], '1')
+        self.assertEquals(CachedData['pocket_error'], 'ActionError')
+
+    def test_revert_keeps_queued_actions(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'favorite', 'item_id': u'300'}])
+        batch = list(StoredData['pocket_actions'])
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'archive', 'item_id': u'300'}])
+        pocket_actions.finish_batch(self.wf, batch, [False])
+
+        link = CachedData['pocket_list'][u'300']
+        self.assertEquals(link['favorite'], '0')
+        self.assertEquals(link['status'], '1')
+
+    def test_optimistic_update(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'archive', 'item_id': u'2'},
+            {'action': 'favorite', 'item_id': u'300'},
+            {'action': 'delete', 'item_id': u'1'},
+            {'action': 'tags_add', 'item_id': u'2', 'tags': 'a, b'},
+            {'action': 'tags_remove', 'item_id': u'2', 'tags': 'foo'},
+        ])
+
+        links = CachedData['pocket_list']
+        self.assertEquals(links[u'2']['status'], '1')
+        self.assertEquals(links[u'300']['favorite'], '1')
+        self.assertTrue(u'1' not in links)
+        self.assertEquals(sorted(links[u'2']['tags']), ['a', 'b'])
+        self.assertEquals(sorted(CachedData['pocket_tags']), ['a', 'b'])
+
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'readd', 'item_id': u'2'},
+            {'action': 'unfavorite', 'item_id': u'300'},
+            {'action': 'tags_replace', 'item_id': u'300', 'tags': 'c'},
+            {'action': 'tags_clear', 'item_id': u'2'},
+        ])
+        self.assertEquals(links[u'2']['status'], '0')
+        self.assertEquals(links[u'300']['favorite'], '0')
+        self.assertEquals(links[u'300']['tags'].keys(), ['c'])
+        self.assertEquals(links[u'2']['tags'], {})
+        self.assertEquals(len(StoredData['pocket_actions']), 9)
+
+    def test_retry_when_offline(self):
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'archive', 'item_id': '1'}])
+        Results.extend([URLError('offline'), URLError('offline')])
+        pocket_actions.main()
+
+        self.assertEquals(len(Commits), 3)
+        self.assertEquals(StoredData.get('pocket_actions'), None)
+        self.assertTrue(pocket_actions.RETRY_DELAY * 4 in self.sleeps)
+
+    def test_keep_actions_when_giving_up(self):
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'archive', 'item_id': '1'}])
+        Results.extend([URLError('offline')] * 10)
+        pocket_actions.main()
+
+        self.assertEquals(len(Commits), pocket_actions.RETRY_ATTEMPTS + 1)
+        self.assertEquals(len(StoredData['pocket_actions']), 1)
+        self.assertEquals(CachedData['pocket_error'], 'URLError')
+
+    def test_failed_send_keeps_batch(self):
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'archive', 'item_id': '1'},
+            {'action': 'delete', 'item_id': '2'},
+        ])
+        batch = list(StoredData['pocket_actions'])
+        Results.append(URLError('offline'))
+        self.assertRaises(URLError, pocket_actions.send_batch, self.wf,
+                          FakePocket('key', 'token'), batch)
+        # Only a response from Pocket removes actions from the queue
+        self.assertEquals(StoredData['pocket_actions'], batch)
+
+    def test_drop_invalid_batch(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'archive', 'item_id': u'1'}])
+        Results.append(InvalidQueryException())
+        pocket_actions.main()
+
+        self.assertEquals(len(Commits), 1)
+        self.assertEquals(StoredData.get('pocket_actions'), None)
+        self.assertEquals(CachedData['pocket_error'],
+                          'InvalidQueryException')
+        self.assertEquals(CachedData['pocket_list'][u'1']['status'], '0')
+
+    def test_queue_add(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        item_id = pocket_actions.queue_add(self.wf, 'http://example.com',
+                                           'Example', ['a', 'b'])
+        pocket_actions.queue_actions(self.wf, [
+            {'action': 'favorite', 'item_id': item_id},
+            {'action': 'archive', 'item_id': u'1'},
+        ])
+
+        link = CachedData['pocket_list'][item_id]
+        self.assertEquals(link['given_url'], 'http://example.com')
+        self.assertEquals(link['favorite'], '1')
+        self.assertEquals(sorted(link['tags']), ['a', 'b'])
+        self.assertTrue(item_id in CachedData['pocket_url_index'].values())
+
+        Results.append([{'item_id': '42', 'title': 'Example Domain',
+                         'resolved_url': 'https://example.com/'}])
+        pocket_actions.main()
+
+        # The add is sent without the temporary item_id, the favorite and
+        # everything after it with the real one in the next batch
+        self.assertEquals(len(Commits), 2)
+        self.assertFalse('item_id' in Commits[0][0])
+        self.assertEquals([q['item_id'] for q in Commits[1]], [u'42', u'1'])
+        links = CachedData['pocket_list']
+        self.assertTrue(item_id not in links)
+        self.assertEquals(links[u'42']['resolved_title'], 'Example Domain')
+        self.assertEquals(links[u'42']['favorite'], '1')
+        self.assertEquals(links[u'42']['status'], '0')
+        self.assertEquals(links[u'1']['status'], '1')
+        self.assertEquals(StoredData.get('pocket_actions'), None)
+
+    def test_failed_add(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        item_id = pocket_actions.queue_add(self.wf, 'http://example.com',
+                                           None, [], archived=True)
+        Results.append([False])
+        pocket_actions.main()
+
+        # The archive of the link is dropped together with its entry
+        self.assertEquals(len(Commits), 1)
+        self.assertTrue(item_id not in CachedData['pocket_list'])
+        self.assertEquals(CachedData['pocket_error'], 'ActionError')
+        self.assertEquals(StoredData.get('pocket_actions'), None)
+
+    def test_delete_before_add_was_sent(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        item_id = pocket_actions.queue_add(self.wf, 'http://example.com',
+                                           None, [])
+        pocket_actions.queue_actions(
+            self.wf, [{'action': 'delete', 'item_id': item_id}])
+        self.assertTrue(item_id not in CachedData['pocket_list'])
+
+        Results.append([{'item_id': '42'}])
+        pocket_actions.main()
+        self.assertEquals(Commits[1], [{'action': 'delete',
+                                        'item_id': u'42'}])
+        self.assertTrue(u'42' not in CachedData['pocket_list'])
+
+    def setUp(self):
+        CachedData.clear()
+        StoredData.clear()
+        del Commits[:]
+        del Results[:]
+        logging.disable(logging.CRITICAL)
+
+        self.flushes = []
+        self.sleeps = []
+        self.wf = Workflow()
+        self.wf.stored_data = StoredData.get
+        self.wf.store_data = StoredData.__setitem__
+        self.wf.cached_data = lambda name, max_age=None: CachedData.get(name)
+        self.wf.cache_data = CachedData.__setitem__
+        self.wf.get_password = lambda account: 'access_token'
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            for action in StoredData.get('pocket_actions') or []:
+                action['queued'] -= seconds
+
+        pocket_actions.Workflow = lambda: self.wf
+        pocket_actions.Pocket = FakePocket
+        pocket_actions.sleep = sleep
+        pocket_actions.start_flush = self.flushes.append
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        reload(pocket_actions)
+
+
+if __name__ == "__main__":
+    unittest.main()
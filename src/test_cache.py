@@ -0,0 +1,103 @@
+import unittest
+
+import test_data
+from pocket_cache import cache_links, merge_added_items
+from pocket_index import build_tag_index, build_url_index, update_tag_model
+from workflow import Workflow
+
+CachedData = {}
+
+# Shape of the item in a /v3/add response
+ADDED_ITEM = {
+    u'item_id': u'5000',
+    u'normal_url': u'http://example.com',
+    u'resolved_url': u'https://example.com/',
+    u'title': u'Example Domain',
+    u'excerpt': u'This domain is for use in illustrative examples',
+    u'is_article': u'1',
+    u'has_image': u'0',
+    u'has_video': u'0',
+}
+
+
+class PocketCacheTestCase(unittest.TestCase):
+
+    def test_merge_added_items(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        CachedData['pocket_since'] = 1500000000
+        merge_added_items(self.wf, [
+            (ADDED_ITEM, None, ['alfred', 'caf\xc3\xa9']),
+            (dict(ADDED_ITEM, item_id=u'5001',
+                  normal_url=u'http://example.org'), u'Other', ['alfred']),
+        ])
+
+        link = CachedData['pocket_list'][u'5000']
+        self.assertEquals(link['given_url'], u'http://example.com')
+        self.assertEquals(link['resolved_title'], u'Example Domain')
+        self.assertEquals(link['status'], '0')
+        self.assertEquals(sorted(link['tags']), [u'alfred', u'caf\xe9'])
+        self.assertTrue(u'caf\xe9' in CachedData['pocket_tags'])
+        self.assertEquals(
+            CachedData['pocket_url_index']['example.com'], u'5000')
+        self.assertEquals(CachedData['pocket_list'][u'5001']['given_title'],
+                          u'Other')
+        self.assertEquals(len(CachedData['pocket_list']), 6)
+        # The next sync continues from the same cursor
+        self.assertEquals(CachedData['pocket_since'], 1500000000)
+
+    def test_merge_readded_item(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        item = dict(ADDED_ITEM, item_id=u'2')
+        merge_added_items(self.wf, [(item, 'Title', ['alfred'])],
+                          archived=True)
+
+        link = CachedData['pocket_list'][u'2']
+        self.assertEquals(link['given_url'], u'http://fniephaus.com')
+        self.assertEquals(link['status'], '1')
+        self.assertEquals(link['favorite'], '1')
+        self.assertTrue('alfred' in link['tags'])
+
+    def test_merge_without_list(self):
+        merge_added_items(self.wf, [(ADDED_ITEM, None, ['alfred'])])
+        self.assertEquals(CachedData, {})
+
+    def test_only_affected_indexes_are_rebuilt(self):
+        links = test_data.get_normal()
+        cache_links(self.wf, links)
+        del self.writes[:]
+
+        links[u'1']['status'] = '1'
+        cache_links(self.wf, links, set([u'1']))
+        self.assertEquals(self.writes, ['pocket_list'])
+
+        del self.writes[:]
+        links[u'2']['tags'][u'new'] = {u'item_id': u'2', u'tag': u'new'}
+        cache_links(self.wf, links, set([u'2']))
+        self.assertTrue('pocket_tag_index' in self.writes)
+        self.assertTrue('pocket_url_index' not in self.writes)
+        self.assertEquals(CachedData['pocket_tag_index'],
+                          build_tag_index(links))
+        model, items = {}, {}
+        update_tag_model(model, items, links)
+        self.assertEquals(CachedData['pocket_tag_model'], model)
+        self.assertEquals(CachedData['pocket_tag_items'], items)
+
+        del links[u'300']
+        cache_links(self.wf, links, set([u'300']))
+        self.assertEquals(CachedData['pocket_url_index'],
+                          build_url_index(links))
+
+    def setUp(self):
+        CachedData.clear()
+        self.wf = Workflow()
+        self.wf.cached_data = lambda name, max_age=None: CachedData.get(name)
+        self.writes = []
+
+        def cache_data(name, data):
+            self.writes.append(name)
+            CachedData[name] = data
+        self.wf.cache_data = cache_data
+
+
+if __name__ == "__main__":
+    unittest.main()
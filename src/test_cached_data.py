@@ -0,0 +1,118 @@
+import os
+import unittest
+
+import workflow.workflow
+from pocket_cache import locked_links
+from workflow import Workflow
+from workflow.workflow import MarshalSerializer, manager
+
+Loads = []
+Stats = []
+
+
+class CountingSerializer(MarshalSerializer):
+
+    @classmethod
+    def load(cls, file_obj):
+        Loads.append(file_obj.name)
+        return MarshalSerializer.load(file_obj)
+
+
+class CountingOS(object):
+    '''
+    Stands in for the os module of workflow.workflow and counts os.stat()
+
+    '''
+
+    def __getattr__(self, name):
+        return getattr(os, name)
+
+    def stat(self, path):
+        Stats.append(path)
+        return os.stat(path)
+
+
+class CachedDataTestCase(unittest.TestCase):
+
+    def test_loaded_once_per_run(self):
+        self.other.cache_data('pocket_list', {'1': {}})
+        self.assertTrue(self.wf.cached_data_fresh('pocket_list', 60))
+        for _ in range(3):
+            self.assertEquals(self.wf.cached_data('pocket_list', max_age=0),
+                              {'1': {}})
+        self.assertEquals(len(Loads), 1)
+        self.assertEquals(len(Stats), 1)
+
+    def test_snapshot_until_forgotten(self):
+        self.other.cache_data('pocket_list', {'1': {}})
+        self.wf.cached_data('pocket_list', max_age=0)
+        self.other.cache_data('pocket_list', {'2': {}})
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0),
+                          {'1': {}})
+
+        self.wf.forget_cached_data('pocket_list')
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0),
+                          {'2': {}})
+
+    def test_invalidated_by_cache_data(self):
+        self.wf.cache_data('pocket_list', {'1': {}})
+        self.wf.cached_data('pocket_list', max_age=0)
+        self.wf.cache_data('pocket_list', {'2': {}})
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0),
+                          {'2': {}})
+        self.wf.cache_data('pocket_list', None)
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0), None)
+
+    def test_misses_are_not_remembered(self):
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0), None)
+        self.assertEquals(self.wf.cached_data_age('pocket_list'), 0)
+        self.other.cache_data('pocket_list', {'1': {}})
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0),
+                          {'1': {}})
+
+    def test_max_age(self):
+        self.other.cache_data('pocket_error', 'URLError')
+        self.assertEquals(self.wf.cached_data('pocket_error', max_age=60),
+                          'URLError')
+        os.utime(self.path('pocket_error'), (0, 0))
+        self.wf.forget_cached_data('pocket_error')
+        self.assertEquals(self.wf.cached_data('pocket_error', max_age=60),
+                          None)
+        self.assertEquals(self.wf.cached_data('pocket_error', lambda: 'new',
+                                              max_age=60), 'new')
+
+    def test_deleted_by_other_process(self):
+        self.other.cache_data('pocket_list', {'1': {}})
+        self.assertTrue(self.wf.cached_data_fresh('pocket_list', 60))
+        self.other.cache_data('pocket_list', None)
+        self.assertEquals(self.wf.cached_data('pocket_list', max_age=0), None)
+
+    def test_locked_links_sees_other_processes(self):
+        self.other.cache_data('pocket_list', {'1': {}})
+        self.wf.cached_data('pocket_list', max_age=0)
+        self.other.cache_data('pocket_list', {'2': {}})
+        with locked_links(self.wf) as links:
+            self.assertEquals(links, {'2': {}})
+
+    def path(self, name):
+        return self.wf.cachefile('%s.counting' % name)
+
+    def setUp(self):
+        del Loads[:]
+        del Stats[:]
+        manager.register('counting', CountingSerializer)
+        workflow.workflow.os = CountingOS()
+        self.wf = Workflow()
+        self.other = Workflow()
+        for wf in [self.wf, self.other]:
+            wf.cache_serializer = 'counting'
+        self.wf.clear_cache()
+
+    def tearDown(self):
+        self.wf.clear_cache()
+        workflow.workflow.os = os
+        manager.unregister('counting')
+
+
+if __name__ == "__main__":
+    unittest.main()
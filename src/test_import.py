@@ -0,0 +1,165 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import pocket_api
+import pocket_import
+import test_data
+from pocket_api import AsyncPocket
+from test_server import PocketServer
+from workflow import Workflow
+
+CachedData = {}
+
+BOOKMARKS = '''<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3>Reading</H3>
+    <DL><p>
+        <DT><A HREF="https://Example.com/a?x=1&amp;y=2" ADD_DATE="1500000000"
+               TAGS="news,longform">Caf\xc3\xa9 &amp; Bar</A>
+        <DT><A HREF="http://google.com/">Google</A>
+        <DT><A HREF="javascript:alert(1)">Bookmarklet</A>
+    </DL><p>
+</DL><p>
+'''
+
+
+class PocketImportTestCase(unittest.TestCase):
+
+    def test_read_bookmarks(self):
+        links = list(pocket_import.read_links(self.write('b.html',
+                                                         BOOKMARKS)))
+        self.assertEquals(len(links), 3)
+        self.assertEquals(links[0]['url'], 'https://Example.com/a?x=1&y=2')
+        self.assertEquals(links[0]['title'], u'Caf\xe9 & Bar')
+        self.assertEquals(links[0]['tags'], ['news', 'longform'])
+        self.assertEquals(links[0]['time'], '1500000000')
+
+    def test_read_bookmarks_in_chunks(self):
+        pocket_import.READ_SIZE = 16
+        links = list(pocket_import.read_links(self.write('b.html',
+                                                         BOOKMARKS)))
+        self.assertEquals([l['title'] for l in links],
+                          [u'Caf\xe9 & Bar', 'Google', 'Bookmarklet'])
+
+    def test_read_csv(self):
+        path = self.write('pocket.csv', 'title,url,time_added,tags\n'
+                          'A,http://a.com,1500000000,x|y\n'
+                          'B,http://b.com,,\n')
+        links = list(pocket_import.read_links(path))
+        self.assertEquals([l['url'] for l in links],
+                          ['http://a.com', 'http://b.com'])
+        self.assertEquals(links[0]['tags'], ['x', 'y'])
+        self.assertEquals(links[1]['time'], None)
+
+        path = self.write('plain.csv', 'A,http://a.com\nB,http://b.com\n')
+        self.assertEquals(
+            [l['url'] for l in pocket_import.read_links(path)],
+            ['http://a.com', 'http://b.com'])
+
+    def test_read_text(self):
+        path = self.write('links.txt', '# my list\nhttp://a.com\n\n'
+                          '  http://b.com  a comment\r\n')
+        self.assertEquals(
+            [l['url'] for l in pocket_import.read_links(path)],
+            ['http://a.com', 'http://b.com'])
+
+    def test_clean_url(self):
+        self.assertEquals(pocket_import.clean_url(' <HTTP://A.com/B> '),
+                          'http://a.com/B')
+        self.assertEquals(pocket_import.clean_url('ftp://a.com'), None)
+        self.assertEquals(pocket_import.clean_url('a.com'), None)
+
+    def test_import(self):
+        links = [self.link('http://a%d.com' % i) for i in range(7)]
+        links[0]['time'] = '1500000000'
+        links += [self.link('http://a1.com/'), self.link('https://google.com'),
+                  self.link('mailto:me@example.com')]
+        counts = self.run_import(links, tags=['imported'])
+
+        self.assertEquals(counts, {'added': 7, 'exists': 1, 'duplicate': 1,
+                                   'failed': 0, 'invalid': 1, 'skipped': 0})
+        # Seven new links in batches of three
+        self.assertEquals(self.server.paths, {'/v3/send': 3})
+        self.assertEquals(len(self.server.account), 17)
+
+        links = CachedData['pocket_list']
+        self.assertEquals(len(links), 11)
+        added = [l for l in links.values()
+                 if l['given_url'] == 'http://a0.com'][0]
+        self.assertEquals(sorted(added['tags']), ['imported', 'x'])
+        self.assertEquals(added['time_added'], '1500000000')
+
+        rows = list(csv.reader(StringIO(self.results.getvalue())))
+        self.assertEquals(rows[0], pocket_import.RESULT_FIELDS)
+        self.assertEquals(len(rows), 11)
+        self.assertTrue(['https://google.com', 'exists', '1111', ''] in rows)
+        self.assertTrue(['http://a1.com/', 'duplicate', '', ''] in rows)
+
+    def test_failed_batch(self):
+        self.server.faults = [(400, {'X-Error': 'Invalid URL'})]
+        pocket_import.CONCURRENCY = 1
+        counts = self.run_import([self.link('http://a%d.com' % i)
+                                  for i in range(5)])
+        self.assertEquals(counts['failed'], 3)
+        self.assertEquals(counts['added'], 2)
+        self.assertTrue('InvalidQueryException' in self.results.getvalue())
+
+    def test_rate_limit_stops_import(self):
+        self.server.rate_limit = 1
+        pocket_import.CONCURRENCY = 1
+        counts = self.run_import([self.link('http://a%d.com' % i)
+                                  for i in range(10)])
+        self.assertEquals(counts['added'], 3)
+        self.assertEquals(counts['failed'], 3)
+        self.assertEquals(counts['skipped'], 4)
+        self.assertEquals(self.server.requests, 2)
+
+    def link(self, url):
+        return {'url': url, 'title': '', 'tags': ['x'], 'time': None}
+
+    def run_import(self, links, tags=None):
+        progress = []
+        with AsyncPocket('consumer_key', 'access_token', workers=2) as pocket:
+            counts = pocket_import.import_links(
+                self.wf, pocket, iter(links), tags, self.results,
+                progress.append)
+        self.assertTrue(len(progress) > 0)
+        return counts
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def setUp(self):
+        CachedData.clear()
+        CachedData['pocket_list'] = test_data.get_normal()
+        self.directory = tempfile.mkdtemp()
+        self.results = StringIO()
+        self.server = PocketServer(items=10).start()
+        self.api_endpoints = pocket_api.Pocket.api_endpoints
+        pocket_api.Pocket.api_endpoints = self.server.endpoints()
+        pocket_import.BATCH_SIZE = 3
+        pocket_import.record_local_write = lambda wf: None
+
+        self.wf = Workflow()
+        self.wf.cached_data = lambda name, max_age=None: CachedData.get(name)
+        self.wf.cache_data = CachedData.__setitem__
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+        pocket_api.Pocket.api_endpoints = self.api_endpoints
+        reload(pocket_import)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+
+import test_data
+from pocket_index import (BloomFilter, build_tag_index, build_url_filter,
+                          build_url_index, complete_tags, find_saved_item,
+                          load_tag_index, load_url_index, normalize_url,
+                          tag_scores, update_tag_model, url_domain)
+from workflow import Workflow
+
+CachedData = {}
+
+
+class PocketIndexTestCase(unittest.TestCase):
+
+    def test_normalize_url(self):
+        self.assertEquals(normalize_url('https://GitHub.com/'),
+                          normalize_url('http://github.com'))
+        self.assertEquals(normalize_url('http://a.com/b/?c=1'), 'a.com/b?c=1')
+        self.assertNotEquals(normalize_url('http://a.com/b?c=1'),
+                             normalize_url('http://a.com/b?c=2'))
+        self.assertEquals(normalize_url('mailto:me'), 'mailto:me')
+
+    def test_build_url_index(self):
+        links = test_data.get_normal()
+        links[u'2']['resolved_url'] = u'https://fniephaus.com/blog/'
+        links[u'300']['resolved_url'] = u'http://google.com/'
+        index = build_url_index(links)
+
+        self.assertEquals(index['fniephaus.com/blog'], u'2222')
+        self.assertEquals(index['fniephaus.com'], u'2222')
+        # Given URLs take precedence over resolved ones
+        self.assertEquals(index['google.com'], u'1111')
+
+    def test_load_url_index(self):
+        self.assertEquals(load_url_index(self.wf), {})
+
+        # Lists cached without an index are indexed on the fly
+        CachedData['pocket_list'] = test_data.get_normal()
+        self.assertEquals(load_url_index(self.wf)['github.com'], u'3333')
+
+        CachedData['pocket_url_index'] = {'github.com': u'42'}
+        self.assertEquals(load_url_index(self.wf)['github.com'], u'42')
+
+    def test_bloom_filter(self):
+        keys = [u'example.com/%d' % i for i in range(1000)]
+        bloom = BloomFilter.for_capacity(len(keys))
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(u'other.com/%d' % i in bloom
+                              for i in range(10000))
+        self.assertTrue(false_positives < 300)
+
+        copy = BloomFilter.from_state(bloom.state())
+        self.assertTrue(all(key in copy for key in keys))
+        self.assertFalse(u'caf\xe9.com' in BloomFilter.for_capacity(0))
+
+    def test_find_saved_item(self):
+        self.assertEquals(find_saved_item(self.wf, 'http://github.com'), None)
+
+        index = build_url_index(test_data.get_normal())
+        CachedData['pocket_url_filter'] = build_url_filter(index)
+        CachedData['pocket_url_index'] = index
+        self.assertEquals(find_saved_item(self.wf, 'https://github.com/'),
+                          u'3333')
+
+        # Links that are not in the filter never load the index
+        del CachedData['pocket_url_index']
+        self.assertEquals(find_saved_item(self.wf, 'http://example.com'),
+                          None)
+        self.assertEquals(self.loaded, ['pocket_url_filter'] * 2 +
+                          ['pocket_url_index', 'pocket_url_filter'])
+
+    def test_build_tag_index(self):
+        links = test_data.get_normal()
+        links[u'2']['tags'] = {u'MyTag': {}, u'mytag': {}}
+        index = build_tag_index(links)
+        self.assertEquals(index, [
+            (u'mytag', u'MyTag', 1, 1396054841),
+            (u'mytag', u'mytag', 2, 1396054841),
+        ])
+
+    def test_complete_tags(self):
+        index = build_tag_index({
+            u'1': {'time_updated': '100', 'tags': {u'python': {}}},
+            u'2': {'time_updated': '200', 'tags': {u'pypy': {},
+                                                   u'caf\xe9': {}}},
+            u'3': {'time_updated': '50', 'tags': {u'python': {}}},
+            u'4': {'time_updated': '300', 'tags': {u'Pyramid': {}}},
+        })
+        self.assertEquals(complete_tags(index, ' #PY', 10),
+                          [u'python', u'Pyramid', u'pypy'])
+        self.assertEquals(complete_tags(index, 'py', 2), [u'python',
+                                                          u'Pyramid'])
+        self.assertEquals(complete_tags(index, 'py', 10, exclude=['python']),
+                          [u'Pyramid', u'pypy'])
+        self.assertEquals(complete_tags(index, 'caf\xc3\xa9', 10),
+                          [u'caf\xe9'])
+        self.assertEquals(complete_tags(index, 'x', 10), [])
+        self.assertEquals(len(complete_tags(index, '', 10)), 4)
+
+    def test_complete_tags_by_score(self):
+        index = build_tag_index({
+            u'1': {'tags': {u'python': {}, u'pypy': {}}},
+            u'2': {'tags': {u'python': {}}},
+        })
+        self.assertEquals(complete_tags(index, 'py', 10),
+                          [u'python', u'pypy'])
+        self.assertEquals(complete_tags(index, 'py', 10, scores={u'pypy': 1}),
+                          [u'pypy', u'python'])
+
+    def test_url_domain(self):
+        self.assertEquals(url_domain('https://WWW.Example.com/a'),
+                          'example.com')
+        self.assertEquals(url_domain('example.com'), '')
+
+    def test_update_tag_model(self):
+        links = test_data.get_normal()
+        links[u'300']['tags'] = {u'code': {}, u'mytag': {}}
+        model, items = {}, {}
+        update_tag_model(model, items, links)
+        self.assertEquals(model['pairs'], {u'code': {u'mytag': 1},
+                                           u'mytag': {u'code': 1}})
+        self.assertEquals(model['domains']['github.com'],
+                          {u'code': 1, u'mytag': 1})
+        self.assertEquals(tag_scores(model, [u'code'], 'google.com'),
+                          {u'mytag': 2})
+
+        # Changed and removed links are taken back out of the counts
+        links[u'300']['tags'] = {u'code': {}, u'python': {}}
+        del links[u'1']
+        links[u'5'] = {'given_url': u'http://www.github.com/x',
+                       'tags': {u'code': {}}}
+        update_tag_model(model, items, links)
+        fresh_model, fresh_items = {}, {}
+        update_tag_model(fresh_model, fresh_items, links)
+        self.assertEquals(model, fresh_model)
+        self.assertEquals(items, fresh_items)
+        self.assertEquals(model['domains'], {
+            'github.com': {u'code': 2, u'python': 1},
+            'fniephaus.com': {u'foo': 1},
+        })
+
+        for link in links.values():
+            link['tags'] = {}
+        update_tag_model(model, items, links)
+        self.assertEquals((model, items), ({'pairs': {}, 'domains': {}}, {}))
+
+    def test_load_tag_index(self):
+        self.assertEquals(load_tag_index(self.wf), [])
+        CachedData['pocket_list'] = test_data.get_normal()
+        self.assertEquals([row[1] for row in load_tag_index(self.wf)],
+                          [u'foo', u'mytag'])
+
+    def setUp(self):
+        CachedData.clear()
+        self.loaded = []
+        self.wf = Workflow()
+
+        def cached_data(name, max_age=None):
+            self.loaded.append(name)
+            return CachedData.get(name)
+        self.wf.cached_data = cached_data
+
+
+if __name__ == "__main__":
+    unittest.main()
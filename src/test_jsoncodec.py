@@ -0,0 +1,79 @@
+import json
+import unittest
+from StringIO import StringIO
+
+from workflow import jsoncodec
+
+
+class PickyBackend(object):
+    '''
+    Stand-in for a fast backend that rejects what ujson cannot decode
+
+    '''
+    calls = []
+
+    @classmethod
+    def loads(cls, s):
+        cls.calls.append(s)
+        if '1e400' in s:
+            raise ValueError('number too big')
+        return json.loads(s)
+
+
+class JSONCodecTestCase(unittest.TestCase):
+
+    def test_loads(self):
+        data = jsoncodec.loads('{"title": "Caf\xc3\xa9", "id": 1}')
+        self.assertEquals(data, {u'title': u'Caf\xe9', u'id': 1})
+        self.assertEquals(jsoncodec.loads(u'[1, "a"]'), [1, u'a'])
+        self.assertEquals(
+            jsoncodec.loads('"Caf\xe9"', 'latin-1'), u'Caf\xe9')
+        self.assertRaises(ValueError, jsoncodec.loads, '{"a": ')
+
+    def test_dumps(self):
+        data = {u'title': u'Caf\xe9', u'tags': [u'a']}
+        self.assertEquals(json.loads(jsoncodec.dumps(data)), data)
+        self.assertTrue('\n  "tags"' in jsoncodec.dumps(data, indent=2))
+
+    def test_file_objects(self):
+        file_obj = StringIO()
+        jsoncodec.dump({u'a': [1, 2]}, file_obj, indent=2)
+        file_obj.seek(0)
+        self.assertEquals(jsoncodec.load(file_obj), {u'a': [1, 2]})
+
+    def test_backend(self):
+        jsoncodec._backend = PickyBackend
+        self.assertEquals(jsoncodec.loads('{"a": 1}'), {u'a': 1})
+        self.assertEquals(PickyBackend.calls, [u'{"a": 1}'])
+        # Encoding stays with the stdlib
+        self.assertEquals(jsoncodec.dumps([1]), '[1]')
+        self.assertEquals(len(PickyBackend.calls), 1)
+
+    def test_backend_decodes_utf8(self):
+        jsoncodec._backend = PickyBackend
+        jsoncodec._decodes_utf8 = True
+        jsoncodec.loads('"Caf\xc3\xa9"')
+        jsoncodec.loads('"Caf\xe9"', 'latin-1')
+        self.assertEquals(PickyBackend.calls,
+                          ['"Caf\xc3\xa9"', u'"Caf\xe9"'])
+        self.assertTrue(isinstance(PickyBackend.calls[0], str))
+
+    def test_backend_fallback(self):
+        jsoncodec._backend = PickyBackend
+        self.assertEquals(jsoncodec.loads('[1e400]'), [float('inf')])
+        self.assertRaises(TypeError, jsoncodec.dumps, set([1]))
+        self.assertEquals(len(PickyBackend.calls), 1)
+
+    def setUp(self):
+        self.backend = jsoncodec._backend
+        self.decodes_utf8 = jsoncodec._decodes_utf8
+        jsoncodec._decodes_utf8 = False
+        del PickyBackend.calls[:]
+
+    def tearDown(self):
+        jsoncodec._backend = self.backend
+        jsoncodec._decodes_utf8 = self.decodes_utf8
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import unittest
+
+from workflow import Workflow, PasswordNotFound
+from workflow.workflow import PasswordExists
+
+
+class StubKeychain(object):
+    '''
+    Keychain backend that keeps passwords in a dict and counts lookups
+
+    '''
+
+    def __init__(self):
+        self.passwords = {}
+        self.lookups = 0
+
+    def add(self, service, account, password):
+        if (service, account) in self.passwords:
+            raise PasswordExists()
+        self.passwords[(service, account)] = password
+
+    def get(self, service, account):
+        self.lookups += 1
+        try:
+            return self.passwords[(service, account)]
+        except KeyError:
+            raise PasswordNotFound()
+
+    def delete(self, service, account):
+        if self.passwords.pop((service, account), None) is None:
+            raise PasswordNotFound()
+
+
+class PasswordMemoTestCase(unittest.TestCase):
+
+    def test_get_password_is_cached(self):
+        self.wf.save_password('pocket_access_token', 'token')
+        for _ in range(3):
+            self.assertEquals(
+                self.wf.get_password('pocket_access_token'), 'token')
+        self.assertEquals(self.keychain.lookups, 0)
+
+        # Nothing is shared with other processes
+        self.assertEquals(
+            self.new_workflow().get_password('pocket_access_token'), 'token')
+        self.assertEquals(self.keychain.lookups, 1)
+
+    def test_cache_miss(self):
+        self.keychain.passwords[(self.wf.bundleid, 'account')] = 'secret'
+        self.assertEquals(self.wf.get_password('account'), 'secret')
+        self.assertEquals(self.wf.get_password('account'), 'secret')
+        self.assertEquals(self.keychain.lookups, 1)
+        self.assertRaises(PasswordNotFound, self.wf.get_password, 'other')
+
+    def test_nothing_written_to_disk(self):
+        self.wf.save_password('account', 'secret')
+        self.wf.get_password('account')
+        self.assertEquals(os.listdir(self.wf.cachedir), [])
+
+    def test_unparsed_password_is_not_cached(self):
+        self.keychain.passwords[(self.wf.bundleid, 'account')] = None
+        self.assertEquals(self.wf.get_password('account'), None)
+        self.keychain.passwords[(self.wf.bundleid, 'account')] = 'secret'
+        self.assertEquals(self.wf.get_password('account'), 'secret')
+        self.assertEquals(self.keychain.lookups, 2)
+
+    def test_delete_password(self):
+        self.wf.save_password('account', 'secret')
+        self.wf.delete_password('account')
+        self.assertRaises(PasswordNotFound, self.wf.get_password, 'account')
+
+    def test_save_password_replaces_cached(self):
+        self.wf.save_password('account', 'old')
+        self.wf.get_password('account')
+        self.wf.save_password('account', 'new')
+        self.assertEquals(self.wf.get_password('account'), 'new')
+        self.assertEquals(self.keychain.passwords.values(), ['new'])
+
+    def new_workflow(self):
+        return Workflow()
+
+    def setUp(self):
+        self.keychain_backend = Workflow.keychain
+        self.keychain = StubKeychain()
+        Workflow.keychain = self.keychain
+        self.wf = self.new_workflow()
+        self.wf.clear_cache()
+
+    def tearDown(self):
+        self.wf.clear_cache()
+        Workflow.keychain = self.keychain_backend
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+import pocket_launcher
+import test_data
+
+CachedData = {}
+Queued = []
+Opened = []
+
+
+class PocketLauncherTestCase(unittest.TestCase):
+
+    def test_get_ids(self):
+        CachedData['pocket_list'] = test_data.get_normal()
+        self.assertEquals(pocket_launcher.get_ids(['http://google.com/']),
+                          [u'1111'])
+
+        CachedData['pocket_url_index'] = {'google.com': u'42'}
+        urls = ['http://google.com', 'http://github.com']
+        self.assertEquals(pocket_launcher.get_ids(urls), [u'42', None])
+
+    def test_item_variables(self):
+        CachedData['pocket_url_index'] = {'google.com': u'1111'}
+        os.environ.update(item_id='42', given_url='http://google.com')
+        # Ignore variables that belong to another item
+        urls = ['http://google.com', 'http://github.com']
+        self.assertEquals(pocket_launcher.get_ids(urls), ['42', None])
+
+    def test_split_urls(self):
+        self.assertEquals(pocket_launcher.split_urls('http://a.com'),
+                          ['http://a.com'])
+        self.assertEquals(
+            pocket_launcher.split_urls('http://a.com\thttp://b.com\n'),
+            ['http://a.com', 'http://b.com'])
+        self.assertEquals(
+            pocket_launcher.split_urls('http://a.com\r\n\r\nhttp://b.com'),
+            ['http://a.com', 'http://b.com'])
+
+    def test_single_action(self):
+        self.execute('--archive', 'http://google.com')
+        self.assertEquals(Queued, [[{'action': 'archive',
+                                     'item_id': u'1111'}]])
+        self.assertEquals(self.output, 'Link archived')
+
+    def test_batch_action(self):
+        self.execute('--favorite', 'http://google.com\thttp://github.com\t'
+                     'http://example.com')
+        # All found links are queued together
+        self.assertEquals(len(Queued), 1)
+        self.assertEquals([q['item_id'] for q in Queued[0]],
+                          [u'1111', u'3333'])
+        self.assertEquals(self.output, '2 links favorited, 1 not found')
+
+    def test_unknown_links(self):
+        self.execute('--delete', 'http://example.com\nhttp://example.org')
+        self.assertEquals(Queued, [])
+        self.assertEquals(self.output, '"item_id" not found')
+
+    def test_visit_and_archive(self):
+        self.execute('--visit-and-archive', 'http://google.com\nhttp://a.com')
+        self.assertEquals(Opened, [['open', 'http://google.com',
+                                    'http://a.com']])
+        self.assertEquals(self.output, '1 links archived, 1 not found')
+
+    def test_website(self):
+        self.execute('--website', 'http://google.com\thttp://github.com')
+        self.assertEquals(Opened, [['open', pocket_launcher.POCKET_URL % 1111,
+                                    pocket_launcher.POCKET_URL % 3333]])
+
+    def execute(self, *args):
+        argv, stdout = sys.argv, sys.stdout
+        sys.argv = ['pocket_launcher.py'] + list(args)
+        sys.stdout = StringIO()
+        try:
+            pocket_launcher.execute()
+            self.output = sys.stdout.getvalue().strip()
+        finally:
+            sys.argv, sys.stdout = argv, stdout
+
+    def setUp(self):
+        CachedData.clear()
+        del Queued[:]
+        del Opened[:]
+        CachedData['pocket_url_index'] = {
+            'google.com': u'1111', 'github.com': u'3333'}
+
+        wf = pocket_launcher.WF
+        self.originals = (wf.cached_data, pocket_launcher.queue_actions,
+                          pocket_launcher.record_local_write,
+                          pocket_launcher.refresh_list,
+                          pocket_launcher.open_alfred,
+                          pocket_launcher.subprocess.call)
+        wf.cached_data = lambda name, max_age=None: CachedData.get(name)
+        pocket_launcher.queue_actions = lambda wf, queries: Queued.append(
+            queries)
+        pocket_launcher.record_local_write = lambda wf: None
+        pocket_launcher.refresh_list = lambda: None
+        pocket_launcher.open_alfred = lambda: None
+        pocket_launcher.subprocess.call = Opened.append
+
+    def tearDown(self):
+        (pocket_launcher.WF.cached_data, pocket_launcher.queue_actions,
+         pocket_launcher.record_local_write, pocket_launcher.refresh_list,
+         pocket_launcher.open_alfred,
+         pocket_launcher.subprocess.call) = self.originals
+        for name in ['item_id', 'given_url']:
+            os.environ.pop(name, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
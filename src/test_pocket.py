@@ -42,6 +42,10 @@ class PocketTestCase(unittest.TestCase):
         pocket.WF._items = []
         pocket.main(None)
         self.assertEquals(len(pocket.WF._items), 2)
+        for item in pocket.WF._items:
+            self.assertEquals(item.getvar('given_url'), item.arg)
+            self.assertTrue(item.getvar('item_id'))
+            self.assertTrue(item.getvar('status') in ('0', '1'))
 
     def test_main_mylist(self):
         CachedData['__workflow_update_status'] = {
@@ -194,6 +198,24 @@ class PocketTestCase(unittest.TestCase):
         self.assertEquals(len(pocket.WF._items), 1)
         self.assertTrue('google.com' in pocket.WF._items[0].subtitle)
 
+    def test_main_syncing(self):
+        CachedData['__workflow_update_status'] = {
+            'available': False
+        }
+        CachedData['pocket_list'] = test_data.get_normal()
+        CachedData['pocket_sync_status'] = {'fetched': 2000, 'total': 5400}
+        sys.argv = ['pocket.py', 'in:mylist ']
+
+        def send_feedback():
+            pass
+        pocket.WF.send_feedback = send_feedback
+        pocket.WF._items = []
+        pocket.WF.rerun = 0
+        pocket.main(None)
+        self.assertEquals(len(pocket.WF._items), 4)
+        self.assertTrue('2000/5400' in pocket.WF._items[0].title)
+        self.assertEquals(pocket.WF.rerun, pocket.SYNC_RERUN)
+
     def test_main_error(self):
         CachedData['__workflow_update_status'] = {
             'available': True
@@ -221,7 +243,7 @@ class PocketTestCase(unittest.TestCase):
         self.assertTrue('Pocket list is empty' in pocket.WF._items[0].title)
 
     def test_register_magic_arguments(self):
-        pocket.WF = pocket.Workflow()
+        pocket.WF = pocket.Workflow3()
         self.assertTrue('deauth' not in pocket.WF.magic_arguments)
         pocket.register_magic_arguments()
         pocket.WF.magic_arguments['deauth']()
@@ -234,7 +256,7 @@ class PocketTestCase(unittest.TestCase):
                 CachedData['pocket_list'] = 12345
                 return None
             return CachedData.get(key)
-        pocket.Workflow.cached_data = cached_data
+        pocket.Workflow3.cached_data = cached_data
         self.assertEquals(pocket.get_links(), 12345)
 
         CachedData.clear()
@@ -278,7 +300,7 @@ class PocketTestCase(unittest.TestCase):
         CachedData.clear()
         Passwords.clear()
 
-        pocket.Workflow.alfred_env = {
+        pocket.Workflow3.alfred_env = {
             'theme_background': 'rgba(40,40,40,0.1)',
         }
 
@@ -286,20 +308,20 @@ class PocketTestCase(unittest.TestCase):
 
         def cached_data(self, key, max_age=None):
             return CachedData.get(key)
-        pocket.Workflow.cached_data = cached_data
+        pocket.Workflow3.cached_data = cached_data
 
         def cache_data(self, key, data):
             CachedData[key] = data
-        pocket.Workflow.cache_data = cache_data
+        pocket.Workflow3.cache_data = cache_data
 
         def get_password(self, key):
             return Passwords.get(key)
-        pocket.Workflow.get_password = get_password
+        pocket.Workflow3.get_password = get_password
 
         def delete_password(self, key):
             if key in Passwords:
                 del Passwords[key]
-        pocket.Workflow.delete_password = delete_password
+        pocket.Workflow3.delete_password = delete_password
 
         def refresh_list():
             pass
@@ -0,0 +1,245 @@
+import time
+import unittest
+from urllib2 import URLError
+
+import pocket_api
+from pocket_api import (Pocket, AsyncPocket, InvalidQueryException,
+                        PocketException, RateLimitException,
+                        ServerMaintenanceException)
+from test_server import PocketServer
+
+Sleeps = []
+
+
+class FastPocket(Pocket):
+    request_timeout = 0.1
+    retry_backoff = 0.01
+    retry_deadline = 5
+
+
+class FastAsyncPocket(AsyncPocket):
+    request_timeout = 1
+
+
+class PocketServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        del Sleeps[:]
+        pocket_api.sleep = Sleeps.append
+
+        self.server = PocketServer(items=50).start()
+        Pocket.connection_pool = pocket_api.requests.ConnectionPool()
+
+    def tearDown(self):
+        pocket_api.sleep = time.sleep
+        Pocket.connection_pool.close()
+        self.server.stop()
+
+    def create_pocket(self, cls):
+        pocket = cls('consumer_key', 'access_token')
+        pocket.api_endpoints = self.server.endpoints()
+        return pocket
+
+
+class PocketRetryTestCase(PocketServerTestCase):
+
+    def test_success(self):
+        self.assertEquals(self.pocket.get()[0]['status'], 1)
+        self.assertEquals(self.server.requests, 1)
+        self.assertEquals(Sleeps, [])
+
+    def test_connection_reuse(self):
+        for _ in range(3):
+            self.pocket.get()
+        self.pocket.add('http://example.com')
+        self.assertEquals(self.server.requests, 4)
+        self.assertEquals(len(self.server.connections), 1)
+
+    def test_retry_server_errors(self):
+        self.server.faults = [503, 500, 502]
+        self.assertEquals(self.pocket.get()[0]['status'], 1)
+        self.assertEquals(self.server.requests, 4)
+        self.assertEquals(len(Sleeps), 3)
+
+    def test_backoff_is_capped(self):
+        class PatientPocket(Pocket):
+            retry_attempts = 20
+            retry_deadline = 60
+
+        for attempt in range(20):
+            delay = PatientPocket._retry_delay(self.server_error(), 0, 0)
+            self.assertTrue(0 <= delay <= Pocket.retry_backoff)
+            delay = PatientPocket._retry_delay(self.server_error(), 15, 0)
+            self.assertTrue(0 <= delay <= Pocket.retry_backoff_max)
+
+    def test_retry_connection_reset(self):
+        self.server.faults = ['reset']
+        self.assertEquals(self.pocket.get()[0]['status'], 1)
+        self.assertEquals(self.server.requests, 2)
+
+    def test_retry_timeout(self):
+        self.server.faults = ['timeout']
+        self.assertEquals(self.pocket.get()[0]['status'], 1)
+        self.assertEquals(self.server.requests, 2)
+
+    def test_retry_after(self):
+        self.server.faults = [(503, {'Retry-After': '2'})]
+        self.assertEquals(self.pocket.get()[0]['status'], 1)
+        self.assertEquals(Sleeps, [2])
+
+    def test_retry_after_exceeds_deadline(self):
+        self.server.faults = [(503, {'Retry-After': '60'})]
+        self.assertRaises(ServerMaintenanceException, self.pocket.get)
+        self.assertEquals(self.server.requests, 1)
+        self.assertEquals(Sleeps, [])
+
+    def test_deadline_caps_request_timeout(self):
+        class HastyPocket(FastPocket):
+            request_timeout = 5
+            retry_deadline = 0.2
+
+        self.server.timeout_delay = 1
+        self.server.faults = ['timeout']
+        pocket = self.create_pocket(HastyPocket)
+        started = time.time()
+        self.assertRaises(IOError, pocket.get)
+        self.assertTrue(time.time() - started < 0.8)
+        self.assertEquals(Sleeps, [])
+
+    def test_attempts_exhausted(self):
+        self.server.faults = [500] * 10
+        self.assertRaises(PocketException, self.pocket.get)
+        self.assertEquals(self.server.requests, Pocket.retry_attempts + 1)
+
+    def test_no_retry_for_client_errors(self):
+        self.server.faults = [(400, {'X-Error': 'Missing url'})]
+        try:
+            self.pocket.add('http://example.com')
+            self.fail('InvalidQueryException not raised')
+        except InvalidQueryException as e:
+            self.assertTrue('Missing url' in str(e))
+        self.assertEquals(self.server.requests, 1)
+
+    def test_no_retry_when_unreachable(self):
+        self.pocket.api_endpoints = {'get': 'http://127.0.0.1:1/v3/get'}
+        self.assertRaises(URLError, self.pocket.get)
+        self.assertEquals(Sleeps, [])
+
+    def test_parse_retry_after(self):
+        self.assertEquals(pocket_api.parse_retry_after(None), None)
+        self.assertEquals(pocket_api.parse_retry_after(' 3 '), 3)
+        self.assertEquals(pocket_api.parse_retry_after('soon'), None)
+        self.assertEquals(pocket_api.parse_retry_after(
+            'Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+
+    def server_error(self):
+        error = PocketException()
+        error.status_code = 500
+        return error
+
+    def setUp(self):
+        super(PocketRetryTestCase, self).setUp()
+        self.pocket = self.create_pocket(FastPocket)
+
+
+class PocketApiTestCase(PocketServerTestCase):
+
+    def test_pagination(self):
+        items = {}
+        for offset in range(0, 50, 20):
+            data = self.pocket.get(state='all', sort='newest', count=20,
+                                   offset=offset, total='1')[0]
+            self.assertEquals(data['total'], '50')
+            items.update(data['list'])
+        self.assertEquals(len(items), 50)
+        self.assertEquals(self.server.requests, 3)
+
+    def test_detail_type(self):
+        simple = self.pocket.get(state='all')[0]['list'].values()
+        complete = self.pocket.get(state='all', detailType='complete')[0]
+        self.assertTrue(all('tags' not in i for i in simple))
+        self.assertTrue(all('tags' in i for i in complete['list'].values()))
+
+    def test_since(self):
+        since = self.pocket.get(state='all')[0]['since']
+        self.assertEquals(self.pocket.get(since=since + 1)[0]['list'], [])
+
+        self.pocket.archive('1').delete('2').commit()
+        data = self.pocket.get(state='all', since=since)[0]
+        self.assertEquals(sorted(data['list']), ['1', '2'])
+        self.assertEquals(data['list']['1']['status'], '1')
+        self.assertEquals(data['list']['2']['status'], '2')
+
+    def test_add(self):
+        item = self.pocket.add('http://example.com', title='Example',
+                               tags='a,b')[0]['item']
+        self.assertEquals(item['item_id'], '51')
+        self.assertEquals(sorted(self.server.account['51']['tags']),
+                          ['a', 'b'])
+
+        results = self.pocket.bulk_add(
+            None, url='http://example.com/2').favorite('51').favorite(
+            '999').commit()[0]['action_results']
+        self.assertEquals(results[0]['item_id'], '52')
+        self.assertEquals(results[1:], [True, False])
+
+    def test_rate_limit(self):
+        self.server.rate_limit = 2
+        headers = self.pocket.get()[1]
+        self.assertEquals(headers['X-Limit-User-Limit'], '2')
+        self.assertEquals(headers['X-Limit-User-Remaining'], '1')
+        self.pocket.get()
+        self.assertRaises(RateLimitException, self.pocket.get)
+
+    def test_authentication(self):
+        self.server.access_token = 'other_token'
+        self.assertRaises(pocket_api.AuthException, self.pocket.get)
+
+    def test_error_rate(self):
+        self.server.error_rate = 1
+        self.assertRaises(PocketException, self.pocket.get)
+        self.assertEquals(self.server.requests, Pocket.retry_attempts + 1)
+
+    def setUp(self):
+        super(PocketApiTestCase, self).setUp()
+        self.pocket = self.create_pocket(FastPocket)
+
+
+class AsyncPocketTestCase(PocketServerTestCase):
+
+    def test_concurrent_requests(self):
+        self.server.latency = 0.2
+        started = time.time()
+        results = [self.pocket.get(offset=offset) for offset in range(4)]
+        for result in results:
+            self.assertEquals(result.get()[0]['status'], 1)
+        self.assertTrue(time.time() - started < 0.6)
+        self.assertEquals(self.server.requests, 4)
+
+    def test_exceptions(self):
+        self.server.faults = [(400, {'X-Error': 'Missing url'})]
+        result = self.pocket.add('http://example.com')
+        self.assertRaises(InvalidQueryException, result.get)
+
+    def test_bulk_actions(self):
+        self.assertEquals(self.pocket.archive(1), self.pocket)
+        self.pocket.favorite(2).delete(3)
+        result = self.pocket.commit()
+        self.assertEquals(result.get()[0]['status'], 1)
+        self.assertEquals(self.server.requests, 1)
+
+        result = self.pocket.archive(4, wait=False)
+        self.assertEquals(result.get()[0]['status'], 1)
+        self.assertEquals(self.server.requests, 2)
+
+    def setUp(self):
+        super(AsyncPocketTestCase, self).setUp()
+        self.pocket = self.create_pocket(FastAsyncPocket)
+
+    def tearDown(self):
+        self.pocket.close()
+        super(AsyncPocketTestCase, self).tearDown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,29 @@
 import unittest
+from urllib2 import URLError
 
 import test_data
-from pocket_api import AuthException, PocketException
-from workflow import PasswordNotFound
+from pocket_api import AuthException, Pocket, PocketException
+from test_server import PocketServer
+from workflow import PasswordNotFound, Workflow
 import pocket_refresh
 import pocket_refresh as pocket_refresh_backup
 
 CachedData = {}
+StoredData = {}
 Passwords = {}
+Requests = []
+Backfills = []
+ORIGINAL_GET = Pocket.__dict__['get']
+# Workflow methods the tests replace on the class
+ORIGINAL_WORKFLOW = dict(
+    (name, Workflow.__dict__[name]) for name in
+    ['get_password', 'delete_password', 'stored_data', 'cached_data',
+     'cache_data'])
+
+
+def restore_workflow():
+    for name, method in ORIGINAL_WORKFLOW.items():
+        setattr(Workflow, name, method)
 
 
 class PocketRefreshTestCase(unittest.TestCase):
@@ -15,14 +31,14 @@ class PocketRefreshTestCase(unittest.TestCase):
     def test_exception_handling(self):
         def get(self, state=None, favorite=None, tag=None, contentType=None,
                 sort=None, detailType=None, search=None, domain=None,
-                since=None, count=None, offset=None):
+                since=None, count=None, offset=None, total=None):
             raise AuthException
         pocket_refresh.Pocket.get = get
         pocket_refresh.main()
 
         def get(self, state=None, favorite=None, tag=None, contentType=None,
                 sort=None, detailType=None, search=None, domain=None,
-                since=None, count=None, offset=None):
+                since=None, count=None, offset=None, total=None):
             raise PocketException
         pocket_refresh.Pocket.get = get
         pocket_refresh.main()
@@ -48,13 +64,154 @@ class PocketRefreshTestCase(unittest.TestCase):
         self.assertTrue('1337' in CachedData['pocket_list'])
         self.assertEquals(len(CachedData['pocket_list']), 5)
 
+    def test_initial_sync_is_simple(self):
+        self.monkeypatch_refresh()
+        pocket_refresh.main()
+        self.assertEquals(Requests[0]['detailType'], 'simple')
+        self.assertTrue(CachedData['pocket_backfill'])
+        self.assertEquals(len(Backfills), 1)
+
+        del Requests[:]
+        pocket_refresh.main()
+        self.assertEquals(Requests[0]['detailType'], 'complete')
+        self.assertEquals(len(Backfills), 2)
+
+    def test_backfill(self):
+        self.monkeypatch_refresh()
+        pocket_refresh.main()
+        CachedData['pocket_list'][u'2'][u'time_updated'] = u'1500000000'
+        del CachedData['pocket_list'][u'4']
+        for item in CachedData['pocket_list'].values():
+            del item['tags']
+
+        pocket_refresh.main(backfill=True)
+        self.assertEquals(Requests[-2]['detailType'], 'complete')
+        self.assertEquals(Requests[-2]['since'], 0)
+        links = CachedData['pocket_list']
+        self.assertEquals(len(links), 3)
+        self.assertTrue('mytag' in links[u'1']['tags'])
+        self.assertTrue('tags' not in links[u'2'])
+        self.assertTrue('mytag' in CachedData['pocket_tags'])
+        self.assertEquals(CachedData['pocket_backfill'], None)
+
+    def test_resume_interrupted_backfill(self):
+        self.monkeypatch_refresh()
+        links = test_data.get_normal()
+        CachedData['pocket_list'] = links
+        CachedData['pocket_backfill'] = {'offset': 0}
+        pages = [dict((k, links[k]) for k in [u'1', u'2']),
+                 dict((k, links[k]) for k in [u'300', u'4'])]
+        failures = [URLError('offline')]
+
+        def get(self, state=None, favorite=None, tag=None, contentType=None,
+                sort=None, detailType=None, search=None, domain=None,
+                since=None, count=None, offset=None, total=None):
+            Requests.append({'detailType': detailType, 'offset': offset})
+            page = offset / pocket_refresh.LINK_LIMIT
+            if page == 1 and failures:
+                raise failures.pop()
+            if page < len(pages):
+                return [{u'status': 1, u'since': 100,
+                         u'list': pages[page], u'total': u'4'}]
+            return [{u'status': 0, u'since': 500, u'list': []}]
+        pocket_refresh.Pocket.get = get
+
+        pocket_refresh.main(backfill=True)
+        self.assertEquals(CachedData['pocket_error'], 'URLError')
+        self.assertEquals(CachedData['pocket_backfill']['offset'],
+                          pocket_refresh.LINK_LIMIT)
+
+        del Requests[:]
+        pocket_refresh.main(backfill=True)
+        # The merged page is listed again to check where to continue
+        self.assertEquals(Requests[0], {'detailType': 'simple',
+                                        'offset': 0})
+        self.assertEquals(Requests[1], {'detailType': 'complete',
+                                        'offset': pocket_refresh.LINK_LIMIT})
+        self.assertEquals(len(Requests), 3)
+        self.assertEquals(CachedData['pocket_backfill'], None)
+        self.assertEquals(CachedData['pocket_error'], None)
+
+    def test_resume_interrupted_sync(self):
+        self.monkeypatch_refresh()
+        links = test_data.get_normal()
+        pages = [dict((k, links[k]) for k in [u'1', u'2']),
+                 dict((k, links[k]) for k in [u'300', u'4'])]
+        failures = [URLError('offline')]
+
+        def get(self, state=None, favorite=None, tag=None, contentType=None,
+                sort=None, detailType=None, search=None, domain=None,
+                since=None, count=None, offset=None, total=None):
+            Requests.append({'detailType': detailType, 'since': since,
+                             'offset': offset})
+            page = offset / pocket_refresh.LINK_LIMIT
+            if page == 1 and failures:
+                raise failures.pop()
+            if page < len(pages):
+                return [{u'status': 1, u'since': 100 + len(Requests),
+                         u'list': pages[page], u'total': u'4'}]
+            return [{u'status': 0, u'since': 500, u'list': []}]
+        pocket_refresh.Pocket.get = get
+
+        pocket_refresh.main()
+        self.assertEquals(CachedData['pocket_error'], 'URLError')
+        self.assertEquals(len(CachedData['pocket_list']), 2)
+        self.assertEquals(CachedData['pocket_checkpoint']['offset'],
+                          pocket_refresh.LINK_LIMIT)
+        self.assertTrue('pocket_since' not in CachedData)
+        # The script filter stops reporting progress of the failed sync
+        self.assertEquals(CachedData['pocket_sync_status'], None)
+
+        del Requests[:]
+        pocket_refresh.main()
+        self.assertEquals(Requests[1]['offset'], pocket_refresh.LINK_LIMIT)
+        self.assertEquals(Requests[1]['since'], 0)
+        self.assertEquals(Requests[1]['detailType'], 'simple')
+        self.assertEquals(len(CachedData['pocket_list']), 4)
+        self.assertEquals(CachedData['pocket_since'], 101)
+        self.assertEquals(CachedData['pocket_checkpoint'], None)
+        self.assertEquals(CachedData['pocket_sync_status'], None)
+        self.assertEquals(CachedData['pocket_error'], None)
+
+    def test_pending_actions_survive_delta(self):
+        self.monkeypatch_refresh()
+        pocket_refresh.main()
+        StoredData['pocket_actions'] = [
+            {'query': {'action': 'favorite', 'item_id': u'1337'}},
+            {'query': {'action': 'tags_add', 'item_id': u'1337',
+                       'tags': 'later'}},
+            {'query': {'action': 'archive', 'item_id': u'300'}},
+        ]
+        pocket_refresh.main()
+        links = CachedData['pocket_list']
+        self.assertEquals(links[u'1337']['favorite'], '1')
+        self.assertTrue('later' in links[u'1337']['tags'])
+        self.assertTrue('later' in CachedData['pocket_tags'])
+        # Only items of the delta are reconciled
+        self.assertEquals(links[u'300']['status'], '0')
+
+    def test_empty_account(self):
+        self.monkeypatch_refresh()
+
+        def get(self, state=None, favorite=None, tag=None, contentType=None,
+                sort=None, detailType=None, search=None, domain=None,
+                since=None, count=None, offset=None, total=None):
+            return [{u'status': 2, u'since': 5, u'list': []}]
+        pocket_refresh.Pocket.get = get
+
+        pocket_refresh.main()
+        self.assertEquals(CachedData['pocket_list'], {})
+        self.assertEquals(CachedData['pocket_since'], 5)
+
     def monkeypatch_refresh(self):
         def get(
                 self, state=None, favorite=None, tag=None, contentType=None,
                 sort=None, detailType=None, search=None, domain=None,
-                since=None, count=None, offset=None):
+                since=None, count=None, offset=None, total=None):
+            Requests.append({'detailType': detailType, 'since': since,
+                             'offset': offset})
             if offset == 0:
-                if CachedData == {}:
+                if not since:
                     return [test_data.get_refresh_initial()]
                 else:
                     return [test_data.get_refresh_delta(since)]
@@ -76,6 +233,14 @@ class PocketRefreshTestCase(unittest.TestCase):
         pocket_refresh = pocket_refresh_backup
         CachedData.clear()
         Passwords.clear()
+        StoredData.clear()
+        del Requests[:]
+        del Backfills[:]
+
+        pocket_refresh.start_backfill = Backfills.append
+        pocket_refresh.start_flush = lambda wf: None
+        pocket_refresh.Workflow.stored_data = (
+            lambda self, name: StoredData.get(name))
 
         def cached_data(self, key, max_age=None):
             pass
@@ -94,6 +259,113 @@ class PocketRefreshTestCase(unittest.TestCase):
                 del Passwords[key]
         pocket_refresh.Workflow.delete_password = delete_password
 
+    def tearDown(self):
+        restore_workflow()
+
+
+class PocketRefreshServerTestCase(unittest.TestCase):
+    '''
+    Syncs against the local Pocket API stand-in over HTTP
+
+    '''
+
+    def test_paginated_sync(self):
+        writes = []
+
+        def cache_data(wf, key, data):
+            writes.append(key)
+            CachedData[key] = data
+        pocket_refresh.Workflow.cache_data = cache_data
+
+        pocket_refresh.main()
+        # The indexes are built once for all pages
+        self.assertEquals(writes.count('pocket_list'), 3)
+        self.assertEquals(writes.count('pocket_url_index'), 1)
+        self.assertEquals(writes.count('pocket_tag_index'), 1)
+        links = CachedData['pocket_list']
+        self.assertEquals(sorted(set(CachedData['pocket_url_index'].values())),
+                          sorted(links))
+        self.assertEquals(sorted(links), sorted(self.server.account))
+        # Three pages and the empty page that ends the sync
+        self.assertEquals(self.server.paths['/v3/get'], 4)
+        self.assertTrue(all('tags' not in l for l in links.values()))
+        self.assertEquals(CachedData['pocket_sync_status'], None)
+
+        pocket_refresh.main(backfill=True)
+        links = CachedData['pocket_list']
+        self.assertTrue(all('tags' in l for l in links.values()))
+        self.assertEquals(CachedData['pocket_backfill'], None)
+
+    def test_delta_sync(self):
+        pocket_refresh.main()
+        self.server.update_item('1', status='2')
+        self.server.update_item('2', favorite='1', status='1')
+        requests = self.server.requests
+
+        pocket_refresh.main()
+        links = CachedData['pocket_list']
+        # One page with the changes and the empty page that ends the sync
+        self.assertEquals(self.server.requests - requests, 2)
+        self.assertTrue('1' not in links)
+        self.assertEquals(links['2']['favorite'], '1')
+        self.assertEquals(links['2']['status'], '1')
+        self.assertEquals(len(links), 119)
+
+    def test_resume_after_deletion(self):
+        self.server.rate_limit = 2
+        pocket_refresh.main()
+        self.assertEquals(CachedData['pocket_checkpoint']['offset'], 100)
+
+        # Moves every item after it up by one
+        newest = sorted(self.server.account.values(), key=lambda i: (
+            int(i['time_added']), int(i['item_id'])))[-1]
+        del self.server.account[newest['item_id']]
+        self.server.rate_limit = None
+        pocket_refresh.main()
+        links = CachedData['pocket_list']
+        self.assertEquals(len(links), 120)
+        self.assertTrue(set(self.server.account) <= set(links))
+
+    def test_rate_limited(self):
+        self.server.rate_limit = 2
+        pocket_refresh.main()
+        self.assertEquals(CachedData['pocket_error'], 'RateLimitException')
+        self.assertEquals(len(CachedData['pocket_list']), 100)
+        self.assertEquals(CachedData['pocket_checkpoint']['offset'], 100)
+        self.assertEquals(CachedData['pocket_sync_status'], None)
+
+        # The next sync continues where the limit was hit
+        self.server.rate_limit = None
+        pocket_refresh.main()
+        self.assertEquals(len(CachedData['pocket_list']), 120)
+        self.assertEquals(CachedData['pocket_error'], None)
+
+    def setUp(self):
+        CachedData.clear()
+        StoredData.clear()
+        self.server = PocketServer(items=120).start()
+        pocket_refresh.LINK_LIMIT = 50
+        pocket_refresh.Pocket.get = ORIGINAL_GET
+        pocket_refresh.Pocket.api_endpoints = self.server.endpoints()
+        pocket_refresh.start_backfill = Backfills.append
+        pocket_refresh.start_flush = lambda wf: None
+
+        Workflow = pocket_refresh.Workflow
+        Workflow.get_password = lambda self, key: 'access_token'
+        Workflow.stored_data = lambda self, name: StoredData.get(name)
+        Workflow.cached_data = (
+            lambda self, key, max_age=None: CachedData.get(key))
+        Workflow.cache_data = (
+            lambda self, key, data: CachedData.__setitem__(key, data))
+
+    def tearDown(self):
+        restore_workflow()
+        self.server.stop()
+        pocket_refresh.LINK_LIMIT = 2000
+        pocket_refresh.Pocket.api_endpoints = self.api_endpoints
+
+    api_endpoints = dict(Pocket.api_endpoints)
+
 
 if __name__ == "__main__":
     unittest.main()
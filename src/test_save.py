@@ -0,0 +1,161 @@
+import sys
+import unittest
+from StringIO import StringIO
+
+import pocket_actions
+import pocket_api
+import pocket_save
+import test_data
+from pocket_cache import cache_links
+from test_server import PocketServer
+
+CachedData = {}
+StoredData = {}
+Passwords = []
+
+
+class PocketSaveTestCase(unittest.TestCase):
+
+    def test_no_link_found(self):
+        self.main()
+        self.assertEquals(self.output, 'No link found!')
+        self.assertEquals(StoredData, {})
+        self.assertEquals(Passwords, [])
+
+    def test_save_browser_link(self):
+        self.browser_link = {'url': 'http://example.com/new', 'title': 'New'}
+        self.main('mytag')
+        self.assertEquals(self.output, 'Safari link added to Pocket.')
+
+        # Saved without a request, under a temporary item_id
+        self.assertEquals(self.server.requests, 0)
+        self.assertEquals(Passwords, [])
+        self.assertEquals(len(self.flushes), 1)
+        query = StoredData['pocket_actions'][0]['query']
+        self.assertEquals(query['action'], 'add')
+        self.assertEquals(query['tags'], 'alfred,mytag')
+        link = CachedData['pocket_list'][query['item_id']]
+        self.assertEquals(link['given_url'], 'http://example.com/new')
+        self.assertEquals(link['given_title'], 'New')
+        self.assertEquals(sorted(link['tags']), ['alfred', 'mytag'])
+
+        self.flush()
+        links = CachedData['pocket_list']
+        self.assertEquals(len(links), 5)
+        self.assertTrue(query['item_id'] not in links)
+        item = self.added_item()
+        link = links[item['item_id']]
+        self.assertEquals(link['given_url'], 'http://example.com/new')
+        self.assertEquals(link['resolved_title'], item['resolved_title'])
+        self.assertEquals(sorted(link['tags']), ['alfred', 'mytag'])
+        self.assertEquals(CachedData['pocket_since'], 1500000000)
+
+    def test_save_and_archive(self):
+        self.browser_link = {'url': 'http://example.com/new', 'title': 'New'}
+        self.main('--add-and-archive')
+        self.assertEquals(
+            [a['query']['action'] for a in StoredData['pocket_actions']],
+            ['add', 'archive'])
+        links = CachedData['pocket_list']
+        self.assertEquals([l['status'] for l in links.values()
+                           if l['given_url'] == 'http://example.com/new'],
+                          ['1'])
+
+        self.flush()
+        item = self.added_item()
+        self.assertEquals(item['status'], '1')
+        self.assertEquals(links[item['item_id']]['status'], '1')
+        # The archive waits for the item_id of the saved link
+        self.assertEquals(self.server.paths, {'/v3/send': 2})
+        self.assertEquals(StoredData['pocket_actions'], None)
+
+    def test_invalid_link(self):
+        self.browser_link = {'url': 'about:blank', 'title': ''}
+        self.main()
+        self.assertEquals(self.output, 'Safari link invalid.')
+        self.assertEquals(StoredData, {})
+
+    def test_link_already_saved(self):
+        self.browser_link = {'url': 'https://google.com/', 'title': 'Google'}
+        self.main('mytag')
+        self.assertEquals(self.output,
+                          'Link already in Pocket, moved it to My List.')
+        self.assertEquals(
+            [a['query'] for a in StoredData['pocket_actions']], [
+                {'action': 'readd', 'item_id': u'1111'},
+                {'action': 'tags_add', 'item_id': u'1111',
+                 'tags': 'alfred,mytag'},
+            ])
+
+        StoredData.clear()
+        self.main('--add-and-archive')
+        self.assertEquals(StoredData['pocket_actions'][0]['query']['action'],
+                          'archive')
+        self.assertEquals(self.server.requests, 0)
+
+    def added_item(self):
+        return [i for i in self.server.account.values()
+                if i['given_url'] == 'http://example.com/new'][0]
+
+    def flush(self):
+        pocket_actions.COALESCE_WINDOW = 0
+        pocket_actions.Workflow = lambda: pocket_save.WF
+        pocket_actions.main()
+
+    def main(self, *args):
+        argv, stdout = sys.argv, sys.stdout
+        sys.argv = ['pocket_save.py'] + list(args)
+        sys.stdout = StringIO()
+        try:
+            pocket_save.main(None)
+            self.output = sys.stdout.getvalue().strip()
+        finally:
+            sys.argv, sys.stdout = argv, stdout
+
+    def setUp(self):
+        CachedData.clear()
+        StoredData.clear()
+        del Passwords[:]
+        self.flushes = []
+        CachedData['pocket_since'] = 1500000000
+        self.browser_link = None
+        self.server = PocketServer(items=400).start()
+
+        def get_password(account):
+            Passwords.append(account)
+            return 'access_token'
+
+        wf = pocket_save.WF
+        self.originals = (wf.cached_data, wf.cache_data, wf.stored_data,
+                          wf.store_data, wf.get_password,
+                          pocket_save.frontmost_app,
+                          pocket_save.get_browser_link,
+                          pocket_save.get_link_from_clipboard,
+                          pocket_save.record_local_write,
+                          pocket_api.Pocket.api_endpoints)
+        wf.cached_data = lambda name, max_age=None: CachedData.get(name)
+        wf.cache_data = CachedData.__setitem__
+        wf.stored_data = StoredData.get
+        wf.store_data = StoredData.__setitem__
+        cache_links(wf, test_data.get_normal())
+        wf.get_password = get_password
+        pocket_save.frontmost_app = lambda: 'Safari'
+        pocket_save.get_browser_link = lambda app: self.browser_link
+        pocket_save.get_link_from_clipboard = lambda: None
+        pocket_save.record_local_write = lambda wf: None
+        pocket_actions.start_flush = self.flushes.append
+        pocket_api.Pocket.api_endpoints = self.server.endpoints()
+
+    def tearDown(self):
+        self.server.stop()
+        wf = pocket_save.WF
+        (wf.cached_data, wf.cache_data, wf.stored_data, wf.store_data,
+         wf.get_password, pocket_save.frontmost_app,
+         pocket_save.get_browser_link, pocket_save.get_link_from_clipboard,
+         pocket_save.record_local_write,
+         pocket_api.Pocket.api_endpoints) = self.originals
+        reload(pocket_actions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import logging
+import time
+import unittest
+
+import pocket_scheduler
+from pocket_scheduler import (refresh_due, record_refresh, record_local_write,
+                              MIN_INTERVAL, MAX_INTERVAL)
+from workflow import Workflow
+
+CachedData = {}
+
+
+class PocketSchedulerTestCase(unittest.TestCase):
+
+    def test_due_without_schedule(self):
+        self.assertTrue(refresh_due(self.wf))
+
+    def test_not_due_after_refresh(self):
+        record_refresh(self.wf, 10, 0.5)
+        self.assertFalse(refresh_due(self.wf))
+        self.assertEquals(CachedData['pocket_schedule']['interval'],
+                          MIN_INTERVAL)
+
+        CachedData['pocket_schedule']['last_refresh'] -= MIN_INTERVAL
+        self.assertTrue(refresh_due(self.wf))
+
+    def test_backoff_when_quiet(self):
+        intervals = []
+        for _ in range(20):
+            record_refresh(self.wf, 0, 0.5)
+            intervals.append(CachedData['pocket_schedule']['interval'])
+        self.assertEquals(intervals, sorted(intervals))
+        self.assertTrue(intervals[0] > MIN_INTERVAL)
+        self.assertEquals(intervals[-1], MAX_INTERVAL)
+
+        record_refresh(self.wf, 1, 0.5)
+        self.assertTrue(
+            CachedData['pocket_schedule']['interval'] < intervals[-1])
+
+    def test_slow_syncs(self):
+        record_refresh(self.wf, 10, 20)
+        self.assertEquals(CachedData['pocket_schedule']['interval'],
+                          20 * pocket_scheduler.DURATION_FACTOR)
+
+    def test_local_write(self):
+        record_local_write(self.wf)
+        self.assertTrue('pocket_schedule' not in CachedData)
+
+        for _ in range(20):
+            record_refresh(self.wf, 0, 0.5)
+        CachedData['pocket_schedule']['last_refresh'] = (
+            time.time() - MIN_INTERVAL)
+        self.assertFalse(refresh_due(self.wf))
+        record_local_write(self.wf)
+        self.assertTrue(refresh_due(self.wf))
+
+    def setUp(self):
+        CachedData.clear()
+        logging.disable(logging.CRITICAL)
+
+        self.wf = Workflow()
+        self.wf.cached_data = lambda key, max_age=None: CachedData.get(key)
+        self.wf.cache_data = CachedData.__setitem__
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import collections
+import os
+import unittest
+from StringIO import StringIO
+
+from workflow import Workflow, background
+from workflow.workflow import (CompressedSerializer, CPickleSerializer,
+                               JSONSerializer, MarshalSerializer, manager)
+
+import config
+import test_data
+
+
+class Tag(unicode):
+    pass
+
+
+class MarshalSerializerTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        for obj in [test_data.get_normal(), {u'caf\xe9': (1, 2L, 3.5)},
+                    [None, True, 'bytes', set([1]), frozenset()]]:
+            self.assertEquals(self.round_trip(obj), obj)
+
+    def test_unsupported_types(self):
+        for obj in [object(), collections.OrderedDict(), [{'a': Tag(u'b')}],
+                    {Tag(u'a'): 1}, (1, [2, {3: object()}])]:
+            self.assertRaises(TypeError, MarshalSerializer.dump, obj,
+                              StringIO())
+
+    def test_header(self):
+        data = self.dump({'a': 1})
+        self.assertTrue(data.startswith(MarshalSerializer.magic))
+        for header in ['', 'xyz', MarshalSerializer.magic + '\x00\x02\x07']:
+            self.assertRaises(ValueError, MarshalSerializer.load,
+                              StringIO(header + data[6:]))
+
+    def test_too_deeply_nested(self):
+        obj = []
+        for _ in range(3000):
+            obj = [obj]
+        file_obj = StringIO()
+        self.assertRaises(ValueError, MarshalSerializer.dump, obj, file_obj)
+        self.assertEquals(file_obj.getvalue(), '')
+
+    def test_cache_serializer(self):
+        self.assertEquals(manager.serializer('marshal'), MarshalSerializer)
+        wf = Workflow()
+        self.assertEquals(wf.cache_serializer, 'cpickle')
+        wf.cache_serializer = config.CACHE_SERIALIZER
+        try:
+            wf.cache_data('test_marshal', test_data.get_normal())
+            self.assertEquals(wf.cached_data('test_marshal', max_age=0),
+                              test_data.get_normal())
+            with open(wf.cachefile('test_marshal.marshal'), 'rb') as f:
+                self.assertEquals(f.read(3), MarshalSerializer.magic)
+        finally:
+            wf.cache_data('test_marshal', None)
+
+    def test_cache_of_other_python(self):
+        wf = Workflow()
+        wf.cache_serializer = 'marshal'
+        path = wf.cachefile('test_marshal.marshal')
+        with open(path, 'wb') as f:
+            f.write(MarshalSerializer.magic + '\x01\x03\x07')
+        try:
+            self.assertEquals(wf.cached_data('test_marshal', max_age=0), None)
+            self.assertFalse(os.path.exists(path))
+            self.assertEquals(
+                wf.cached_data('test_marshal', lambda: 1, max_age=0), 1)
+        finally:
+            wf.cache_data('test_marshal', None)
+
+    def test_update_check_reads_default_cache(self):
+        # update.py caches the latest version with the default serializer
+        key = '__workflow_latest_version'
+        Workflow().cache_data(key, {'available': False})
+        wf = Workflow()
+        wf.cache_serializer = 'marshal'
+        wf._update_settings = {'github_slug': 'fniephaus/alfred-pocket'}
+        checks = []
+        run_in_background = background.run_in_background
+        background.run_in_background = lambda name, cmd: checks.append(cmd)
+        try:
+            wf.check_update()
+            self.assertEquals(checks, [])
+        finally:
+            background.run_in_background = run_in_background
+            Workflow().cache_data(key, None)
+
+    def dump(self, obj):
+        file_obj = StringIO()
+        MarshalSerializer.dump(obj, file_obj)
+        return file_obj.getvalue()
+
+    def round_trip(self, obj):
+        return MarshalSerializer.load(StringIO(self.dump(obj)))
+
+
+class CompressedSerializerTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        links = test_data.get_normal()
+        for serializer in [MarshalSerializer, CPickleSerializer,
+                           JSONSerializer]:
+            compressed = CompressedSerializer(serializer)
+            self.assertEquals(self.round_trip(compressed, links), links)
+
+    def test_small_payloads_are_not_compressed(self):
+        serializer = CompressedSerializer(MarshalSerializer)
+        data = self.dump(serializer, {'a': 1})
+        self.assertEquals(data[:4], 'AWZ0')
+        self.assertEquals(self.round_trip(serializer, {'a': 1}), {'a': 1})
+
+        obj = {'title': 'x' * 10000}
+        data = self.dump(serializer, obj)
+        self.assertEquals(data[:4], 'AWZz')
+        self.assertTrue(len(data) < 1000)
+        self.assertEquals(self.round_trip(serializer, obj), obj)
+
+    def test_level(self):
+        serializer = CompressedSerializer(MarshalSerializer,
+                                          levels=((10, 9), (100, 1)))
+        self.assertEquals([serializer.level(size) for size in
+                           [0, 9, 10, 99, 100, 10 ** 9]],
+                          [0, 0, 9, 9, 1, 1])
+
+    def test_header(self):
+        serializer = CompressedSerializer(MarshalSerializer)
+        for data in ['', 'AWM', 'AWZx' + self.dump(MarshalSerializer, 1)]:
+            self.assertRaises(ValueError, serializer.load, StringIO(data))
+
+    def test_cache_serializer(self):
+        wf = Workflow()
+        wf.cache_serializer = 'zmarshal'
+        try:
+            wf.cache_data('test_zmarshal', test_data.get_normal())
+            self.assertEquals(wf.cached_data('test_zmarshal', max_age=0),
+                              test_data.get_normal())
+            self.assertTrue(os.path.exists(
+                wf.cachefile('test_zmarshal.zmarshal')))
+        finally:
+            wf.cache_data('test_zmarshal', None)
+
+    def dump(self, serializer, obj):
+        file_obj = StringIO()
+        serializer.dump(obj, file_obj)
+        return file_obj.getvalue()
+
+    def round_trip(self, serializer, obj):
+        return serializer.load(StringIO(self.dump(serializer, obj)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,470 @@
+'''
+Local stand-in for the Pocket API, used by tests and benchmarks.
+
+Serves /v3/get, /v3/add and /v3/send over HTTP for a generated account and
+can simulate latency, failing requests and rate limits.
+
+Usage: python test_server.py [--items N] [--port PORT] [--latency SECONDS]
+                             [--error-rate RATE] [--rate-limit REQUESTS]
+'''
+import BaseHTTPServer
+import SocketServer
+import argparse
+import json
+import random
+import threading
+import time
+import urlparse
+
+DOMAINS = [
+    'arstechnica.com', 'bbc.co.uk', 'economist.com', 'github.com',
+    'medium.com', 'nytimes.com', 'stackoverflow.com', 'theverge.com',
+    'wikipedia.org', 'youtube.com',
+]
+WORDS = (
+    'alfred apple async backup browser cache coffee design engineering '
+    'future guide history internet javascript keyboard latency machine '
+    'network open performance python reading science security software '
+    'startup sync travel unicode video weekend workflow writing'
+).split()
+TAGS = [
+    'alfred', 'cooking', 'design', 'longform', 'news', 'python', 'research',
+    'travel', 'video', 'work',
+]
+# Fields that are only returned for detailType=complete
+COMPLETE_FIELDS = ['authors', 'images', 'image', 'tags', 'videos']
+RATE_LIMIT_ERROR = ('User was authenticated, but access denied due to lack '
+                    'of permission or rate limiting')
+
+
+def generate_item(rng, item_id, now):
+    domain = rng.choice(DOMAINS)
+    url = 'https://%s/%s-%d' % (domain, '-'.join(rng.sample(WORDS, 3)),
+                                item_id)
+    title = ' '.join(w.capitalize() for w in rng.sample(WORDS, 6))
+    time_added = now - rng.randint(0, 3 * 365 * 24 * 3600)
+    favorite = rng.random() < 0.1
+    has_video = rng.random() < 0.1
+    has_image = rng.random() < 0.4
+    tags = rng.sample(TAGS, rng.choice([0, 0, 1, 1, 2, 3]))
+
+    item = {
+        'item_id': str(item_id),
+        'resolved_id': str(item_id),
+        'given_url': url,
+        'given_title': title if rng.random() < 0.5 else '',
+        'resolved_url': url.replace('https://', 'https://www.'),
+        'resolved_title': title,
+        'favorite': '1' if favorite else '0',
+        'status': '1' if rng.random() < 0.6 else '0',
+        'time_added': str(time_added),
+        'time_updated': str(time_added),
+        'time_read': '0',
+        'time_favorited': str(time_added) if favorite else '0',
+        'sort_id': item_id,
+        'excerpt': ' '.join(rng.choice(WORDS) for _ in range(40)),
+        'is_article': '0' if has_video else '1',
+        'is_index': '0',
+        'has_video': '1' if has_video else '0',
+        'has_image': '1' if has_image else '0',
+        'word_count': str(rng.randint(100, 8000)),
+        'lang': 'en',
+        'tags': dict((t, {'item_id': str(item_id), 'tag': t}) for t in tags),
+        'authors': {},
+        'images': {},
+        'videos': {},
+    }
+    if has_image:
+        image = {'item_id': str(item_id), 'image_id': '1',
+                 'src': 'https://%s/image-%d.jpg' % (domain, item_id),
+                 'width': '0', 'height': '0', 'credit': '', 'caption': ''}
+        item['image'] = dict((k, image[k]) for k in ['item_id', 'src'])
+        item['images'] = {'1': image}
+    if has_video:
+        item['videos'] = {'1': {
+            'item_id': str(item_id), 'video_id': '1', 'type': '1',
+            'src': 'https://www.youtube.com/embed/%d' % item_id,
+            'width': '0', 'height': '0', 'vid': str(item_id), 'length': '0'}}
+    return item
+
+
+def generate_account(items, seed=0):
+    '''
+    Returns a dict of item_id to item with realistic /v3/get fields
+
+    '''
+    rng = random.Random(seed)
+    now = int(time.time()) - 60
+    return dict((str(i), generate_item(rng, i, now))
+                for i in range(1, items + 1))
+
+
+class PocketHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response with a single write like a real server would
+    wbufsize = -1
+
+    def do_POST(self):
+        server = self.server.pocket
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        if 'json' in self.headers.get('content-type', ''):
+            params = json.loads(body)
+        else:
+            params = dict(urlparse.parse_qsl(body))
+
+        fault = server.record_request(self.path, self.client_address)
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        if fault == 'reset':
+            self.close_connection = 1
+            return
+        if fault == 'timeout':
+            time.sleep(server.timeout_delay)
+            fault = None
+
+        headers, limited = server.rate_limit_headers()
+        if isinstance(fault, tuple):
+            fault, extra_headers = fault
+            headers.update(extra_headers)
+
+        if fault:
+            return self.send_error_response(fault, headers)
+        if limited:
+            headers['X-Error'] = RATE_LIMIT_ERROR
+            return self.send_error_response(403, headers)
+        if not server.authorized(params):
+            headers['X-Error'] = 'Invalid consumer key or access token'
+            return self.send_error_response(401, headers)
+
+        method = self.path.rstrip('/').split('/')[-1]
+        if method not in ('get', 'add', 'send'):
+            return self.send_error_response(404, headers)
+        try:
+            response = getattr(server, method)(params)
+        except (KeyError, ValueError) as e:
+            headers['X-Error'] = 'Invalid request: %s' % e
+            return self.send_error_response(400, headers)
+
+        self.send_json(200, response, headers)
+
+    def send_error_response(self, code, headers):
+        self.send_json(code, {'status': 0}, headers)
+
+    def send_json(self, code, data, headers):
+        body = json.dumps(data)
+        self.send_response(code)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.pocket.bytes_sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadedHTTPServer(SocketServer.ThreadingMixIn,
+                         BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class PocketServer(object):
+    '''
+    Pocket API stand-in running in a background thread.
+
+    faults is a list of scripted outcomes for the next requests: an HTTP
+    status code, a (status code, headers) tuple, 'reset' to close the
+    connection without a response, 'timeout' to answer after
+    timeout_delay seconds or None for a normal response. Once it is
+    empty, requests fail randomly at error_rate with one of error_codes.
+
+    '''
+
+    def __init__(self, items=100, seed=0, latency=0, jitter=0,
+                 error_rate=0, error_codes=(500, 502, 503), rate_limit=None,
+                 rate_window=3600, access_token=None, host='127.0.0.1',
+                 port=0):
+        self.account = generate_account(items, seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.access_token = access_token
+        self.faults = []
+        self.timeout_delay = 0.3
+        self.requests = 0
+        self.paths = {}
+        self.connections = set()
+        self.bytes_sent = 0
+        self._window_start = time.time()
+        self._window_requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadedHTTPServer((host, port), PocketHandler)
+        self._httpd.pocket = self
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self._httpd.server_address
+
+    def endpoints(self):
+        '''
+        Returns replacements for Pocket.api_endpoints
+
+        '''
+        return dict((method, '%s/v3/%s' % (self.url, method))
+                    for method in ['add', 'send', 'get'])
+
+    def start(self):
+        thread = threading.Thread(target=self._httpd.serve_forever,
+                                  kwargs={'poll_interval': 0.05})
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def record_request(self, path, client_address):
+        '''
+        Counts a request and returns the fault to answer it with, if any
+
+        '''
+        with self._lock:
+            self.requests += 1
+            self.paths[path] = self.paths.get(path, 0) + 1
+            self.connections.add(client_address)
+            self._window_requests += 1
+            if self.faults:
+                return self.faults.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.error_codes)
+        return None
+
+    def rate_limit_headers(self):
+        '''
+        Returns the X-Limit-User-* headers for the current request and
+        whether it exceeds the limit
+
+        '''
+        if not self.rate_limit:
+            return {}, False
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.rate_window:
+                self._window_start = now
+                self._window_requests = 1
+            used = self._window_requests
+            reset = int(self._window_start + self.rate_window - now)
+        headers = {
+            'X-Limit-User-Limit': str(self.rate_limit),
+            'X-Limit-User-Remaining': str(max(0, self.rate_limit - used)),
+            'X-Limit-User-Reset': str(reset),
+        }
+        return headers, used > self.rate_limit
+
+    def authorized(self, params):
+        if self.access_token is None:
+            return True
+        return params.get('access_token') == self.access_token
+
+    def get(self, params):
+        since = int(params.get('since') or 0)
+        state = params.get('state', 'unread')
+        statuses = {'unread': ['0'], 'archive': ['1']}.get(state, ['0', '1'])
+        # Deleted items are only reported to clients that already synced
+        if since:
+            statuses = statuses + ['2']
+
+        with self._lock:
+            items = [dict(i) for i in self.account.values()
+                     if i['status'] in statuses and
+                     int(i['time_updated']) >= since and
+                     self._matches(i, params)]
+
+        sort = params.get('sort', 'newest')
+        if sort in ('newest', 'oldest'):
+            items.sort(key=lambda i: (int(i['time_added']),
+                                      int(i['item_id'])),
+                       reverse=sort == 'newest')
+        elif sort in ('title', 'site'):
+            field = 'resolved_title' if sort == 'title' else 'resolved_url'
+            items.sort(key=lambda i: i[field])
+
+        total = len(items)
+        offset = int(params.get('offset') or 0)
+        count = int(params.get('count') or 0)
+        if count:
+            items = items[offset:offset + count]
+
+        if params.get('detailType', 'simple') == 'simple':
+            for item in items:
+                for field in COMPLETE_FIELDS:
+                    item.pop(field, None)
+
+        response = {
+            'status': 1 if items else 2,
+            'complete': 1,
+            'error': None,
+            'since': int(time.time()),
+            'list': dict((i['item_id'], i) for i in items) or [],
+        }
+        if params.get('total') == '1':
+            response['total'] = str(total)
+        return response
+
+    def _matches(self, item, params):
+        if 'favorite' in params and item['favorite'] != params['favorite']:
+            return False
+        tag = params.get('tag')
+        if tag == '_untagged_' and item.get('tags'):
+            return False
+        if tag and tag != '_untagged_' and tag not in item.get('tags', {}):
+            return False
+        content_type = params.get('contentType')
+        if content_type == 'article' and item['is_article'] != '1':
+            return False
+        if content_type == 'video' and item['has_video'] != '1':
+            return False
+        if content_type == 'image' and item['has_image'] != '1':
+            return False
+        search = params.get('search', '').lower()
+        if search and search not in (item['resolved_title'] + ' ' +
+                                     item['given_url']).lower():
+            return False
+        domain = params.get('domain')
+        if domain and domain not in item['given_url']:
+            return False
+        return True
+
+    def add(self, params):
+        with self._lock:
+            item = self._add(params)
+        return {'item': item, 'status': 1}
+
+    def send(self, params):
+        actions = params['actions']
+        if isinstance(actions, basestring):
+            actions = json.loads(actions)
+
+        results = []
+        with self._lock:
+            for action in actions:
+                if action['action'] == 'add':
+                    results.append(self._add(action))
+                else:
+                    results.append(self._modify(action))
+        return {'action_results': results, 'status': 1}
+
+    def _add(self, params):
+        url = params['url']
+        now = str(int(time.time()))
+        for item in self.account.values():
+            if item['given_url'] == url and item['status'] != '2':
+                item.update({'status': '0', 'time_updated': now})
+                self._tag(item, params.get('tags'))
+                return dict(item)
+
+        item_id = str(max([int(i) for i in self.account] or [0]) + 1)
+        item = generate_item(self._random, int(item_id), int(now))
+        item.update({
+            'given_url': url,
+            'resolved_url': url,
+            'given_title': params.get('title') or '',
+            'resolved_title': params.get('title') or '',
+            'status': '0',
+            'favorite': '0',
+            'time_added': now,
+            'time_updated': now,
+            'tags': {},
+        })
+        self._tag(item, params.get('tags'))
+        self.account[item_id] = item
+        return dict(item)
+
+    def _tag(self, item, tags):
+        for tag in (tags or '').split(','):
+            tag = tag.strip()
+            if tag:
+                item.setdefault('tags', {})[tag] = {
+                    'item_id': item['item_id'], 'tag': tag}
+
+    def _modify(self, action):
+        name = action['action']
+        if name == 'tag_rename':
+            for item in self.account.values():
+                tags = item.get('tags', {})
+                if action['old_tag'] in tags:
+                    del tags[action['old_tag']]
+                    self._tag(item, action['new_tag'])
+                    item['time_updated'] = str(int(time.time()))
+            return True
+
+        item = self.account.get(str(action.get('item_id')))
+        if item is None or item['status'] == '2':
+            return False
+
+        if name == 'archive':
+            item['status'] = '1'
+        elif name == 'readd':
+            item['status'] = '0'
+        elif name == 'favorite':
+            item['favorite'] = '1'
+        elif name == 'unfavorite':
+            item['favorite'] = '0'
+        elif name == 'delete':
+            item['status'] = '2'
+        elif name in ('tags_replace', 'tags_clear'):
+            item['tags'] = {}
+        elif name not in ('tags_add', 'tags_remove'):
+            return False
+        if name in ('tags_add', 'tags_replace'):
+            self._tag(item, action.get('tags'))
+        elif name == 'tags_remove':
+            for tag in action.get('tags', '').split(','):
+                item.get('tags', {}).pop(tag.strip(), None)
+
+        item['time_updated'] = str(int(time.time()))
+        return True
+
+    def update_item(self, item_id, **fields):
+        '''
+        Changes an item as another Pocket client would
+
+        '''
+        with self._lock:
+            self.account[item_id].update(fields)
+            self.account[item_id]['time_updated'] = str(int(time.time()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--jitter', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit', type=int, default=None)
+    args = parser.parse_args()
+
+    server = PocketServer(items=args.items, latency=args.latency,
+                          jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit=args.rate_limit, port=args.port)
+    print 'Serving %d items at %s/v3/' % (args.items, server.url)
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
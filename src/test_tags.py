@@ -0,0 +1,111 @@
+import subprocess
+import sys
+import unittest
+
+import pocket_tags
+import test_data
+from pocket_cache import cache_links
+from workflow import Workflow
+
+CachedData = {}
+
+
+class PocketTagsTestCase(unittest.TestCase):
+
+    def test_add_link(self):
+        self.main('--add-and-archive', '')
+        self.assertEquals(self.wf._items[0].title, 'Add and archive this link')
+        # Without a partial tag the most used tags are suggested
+        self.assertEquals(self.suggestions(),
+                          [('mytag', '#mytag'), ('later', '#later'),
+                           ('news', '#news')])
+
+    def test_complete_last_tag(self):
+        self.main('--add', '#later, #N')
+        self.assertEquals(self.wf._items[0].arg, '#later, #N')
+        self.assertEquals(self.suggestions(), [('news', '#later, #news')])
+
+    def test_entered_tags_are_not_suggested(self):
+        self.main('--add', 'mytag, ')
+        self.assertEquals(self.suggestions(),
+                          [('later', 'mytag, #later'),
+                           ('news', 'mytag, #news')])
+
+    def test_api_not_imported(self):
+        # Suggestions are shown on every keystroke and need no requests
+        script = ('import sys, pocket_tags; '
+                  'print "pocket_api" in sys.modules')
+        output = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEquals(output.strip(), 'False')
+
+    def test_tags_used_together(self):
+        links = CachedData['pocket_list']
+        links[u'4']['tags'] = {u'news': {}, u'later': {}}
+        links[u'300']['tags'] = {u'news': {}}
+        cache_links(self.wf, links)
+        self.main('--add', '#news, ')
+        self.assertEquals(self.suggestions()[0], ('later', '#news, #later'))
+
+    def test_tags_used_on_domain(self):
+        self.domain = 'github.com'
+        self.main('--add', '')
+        self.assertEquals([tag for tag, _ in self.suggestions()],
+                          ['mytag', 'news', 'later'])
+        self.assertEquals(self.domains, 1)
+
+        # The domain is looked up once for all keystrokes
+        self.main('--add', 'n')
+        self.assertEquals(self.suggestions(), [('news', '#news')])
+        self.assertEquals(self.domains, 1)
+
+    def test_limit(self):
+        pocket_tags.COMPLETION_LIMIT = 1
+        self.main('--add', '')
+        self.assertEquals(self.suggestions(), [('mytag', '#mytag')])
+
+    def suggestions(self):
+        return [(item.title[len(' > Add #'):], item.autocomplete)
+                for item in self.wf._items[1:]]
+
+    def main(self, *args):
+        argv = sys.argv
+        sys.argv = ['pocket_tags.py'] + list(args)
+        self.wf._items = []
+        try:
+            pocket_tags.main()
+        finally:
+            sys.argv = argv
+
+    def setUp(self):
+        CachedData.clear()
+        self.domain = ''
+        self.domains = 0
+        self.wf = Workflow()
+        self.wf.cache_data = CachedData.__setitem__
+
+        def cached_data(name, data_func=None, max_age=None):
+            if name not in CachedData and data_func:
+                CachedData[name] = data_func()
+            return CachedData.get(name)
+        self.wf.cached_data = cached_data
+
+        def link_domain():
+            self.domains += 1
+            return self.domain
+        self.wf.send_feedback = lambda: None
+
+        links = test_data.get_normal()
+        for item_id, tags in [(u'1', ['mytag', 'later']), (u'2', ['mytag']),
+                              (u'300', ['news', 'mytag'])]:
+            links[item_id]['tags'] = dict((t, {'tag': t}) for t in tags)
+        links[u'1']['time_updated'] = '1500000000'
+        cache_links(self.wf, links)
+        pocket_tags.Workflow = lambda: self.wf
+        pocket_tags.link_domain = link_domain
+
+    def tearDown(self):
+        reload(pocket_tags)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# encoding: utf-8
+#
+# MIT Licence. See http://opensource.org/licenses/MIT
+#
+
+"""JSON decoding with the fastest available backend.
+
+Decodes with :mod:`ujson` or :mod:`simplejson` (if its C speedups are
+compiled) when installed, and retries anything a backend rejects with the
+standard library's :mod:`json`, so errors are always the standard
+library's. The backends may round floats differently in the last digit.
+
+Encoding always uses :mod:`json`: the backends differ in float precision
+and in escaping ``/``, which would change what is written and sent.
+
+"""
+
+from __future__ import absolute_import
+
+import json
+
+#: Name of the module used to encode and decode JSON
+BACKEND = 'json'
+_backend = None
+# Whether the backend decodes UTF-8 encoded ``str`` to ``unicode`` itself
+_decodes_utf8 = False
+
+try:
+    import ujson as _backend
+    BACKEND = 'ujson'
+    _decodes_utf8 = True
+except ImportError:
+    try:
+        import simplejson as _backend
+        # Without its speedups simplejson is slower than the stdlib
+        from simplejson import _speedups  # noqa: F401
+        BACKEND = 'simplejson'
+    except ImportError:
+        _backend = None
+
+
+def loads(s, encoding='utf-8'):
+    """Decode JSON from a string.
+
+    :param s: JSON document
+    :type s: ``str`` or ``unicode``
+    :param encoding: encoding of ``s`` if it is a ``str``
+    :returns: decoded object
+
+    """
+    if _backend is not None:
+        data = s
+        if isinstance(s, str) and not (_decodes_utf8 and _is_utf8(encoding)):
+            # simplejson returns the ASCII strings of str input as str
+            data = s.decode(encoding)
+        try:
+            return _backend.loads(data)
+        except (ValueError, OverflowError):
+            pass
+
+    if isinstance(s, str):
+        # The stdlib scanner is faster on unicode than on encoded input
+        s = s.decode(encoding)
+    return json.loads(s)
+
+
+def _is_utf8(encoding):
+    return encoding.lower().replace('-', '').replace('_', '') == 'utf8'
+
+
+def dumps(obj, indent=None):
+    """Encode ``obj`` as a JSON string.
+
+    :param obj: JSON-serializable data structure
+    :param indent: number of spaces to indent nested structures by
+    :returns: JSON document
+    :rtype: ``str``
+
+    """
+    return json.dumps(obj, indent=indent)
+
+
+def load(file_obj, encoding='utf-8'):
+    """Decode JSON from an open file.
+
+    :param file_obj: file handle
+    :type file_obj: ``file`` object
+    :returns: decoded object
+
+    """
+    return loads(file_obj.read(), encoding)
+
+
+def dump(obj, file_obj, indent=None):
+    """Encode ``obj`` as JSON to an open file.
+
+    :param obj: JSON-serializable data structure
+    :param file_obj: file handle
+    :type file_obj: ``file`` object
+    :param indent: number of spaces to indent nested structures by
+
+    """
+    file_obj.write(dumps(obj, indent))
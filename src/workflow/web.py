@@ -10,19 +10,23 @@
 """Lightweight HTTP library with a requests-like interface."""
 
 import codecs
-import json
+from cStringIO import StringIO
+import httplib
 import mimetypes
 import os
 import random
 import re
 import socket
 import string
+import threading
 import unicodedata
 import urllib
 import urllib2
 import urlparse
 import zlib
 
+from . import jsoncodec
+
 
 USER_AGENT = u'Alfred-Workflow/1.36 (+http://www.deanishe.net/alfred-workflow)'
 
@@ -232,6 +236,11 @@ class Response(object):
             except AttributeError:  # pragma: no cover
                 pass
             self.status_code = err.code
+            # Keep error headers (e.g. ``Retry-After``) available to callers
+            headers = err.info()
+            if headers is not None:
+                for key in headers.keys():
+                    self.headers[key.lower()] = headers.get(key)
         else:
             self.status_code = self.raw.getcode()
             self.url = self.raw.geturl()
@@ -278,7 +287,7 @@ class Response(object):
         :rtype: list, dict or unicode
 
         """
-        return json.loads(self.content, self.encoding or 'utf-8')
+        return jsoncodec.loads(self.content, self.encoding or 'utf-8')
 
     @property
     def encoding(self):
@@ -463,6 +472,60 @@ class Response(object):
         return encoding
 
 
+class PooledResponse(Response):
+    """Returned by :meth:`ConnectionPool.request`.
+
+    Behaves like :class:`Response`, but wraps a body that has already been
+    read from a pooled :class:`httplib.HTTPConnection`, so the connection
+    can be reused. Streaming is emulated on the buffered body.
+
+    """
+
+    def __init__(self, url, response, body, stream=False):
+        """Process an :class:`httplib.HTTPResponse` and its ``body``.
+
+        :param url: URL that was requested
+        :type url: str
+        :param response: response of a pooled connection
+        :type response: :class:`httplib.HTTPResponse`
+        :param body: complete body of ``response``
+        :type body: str
+        :param stream: Whether to stream response or retrieve it all at once
+        :type stream: bool
+
+        """
+        self.request = None
+        self._stream = stream
+        self.url = url
+        self.raw = urllib.addinfourl(StringIO(body), response.msg, url,
+                                     response.status)
+        self._encoding = None
+        self.error = None
+        self.status_code = response.status
+        self.reason = RESPONSES.get(self.status_code)
+        self.headers = CaseInsensitiveDictionary()
+        self._content = None
+        self._content_loaded = False
+        self._gzipped = False
+
+        headers = response.msg
+        for key in headers.keys():
+            self.headers[key.lower()] = headers.get(key)
+
+        # Redirects are not followed, same as `urllib2` without redirects
+        if not 200 <= self.status_code < 300:
+            self.error = urllib2.HTTPError(url, self.status_code, self.reason,
+                                           headers, StringIO(body))
+            return
+
+        self.transfer_encoding = headers.getencoding()
+        self.mimetype = headers.gettype()
+
+        if 'gzip' in headers.get('content-encoding', '') or \
+                'gzip' in headers.get('transfer-encoding', ''):
+            self._gzipped = True
+
+
 def request(method, url, params=None, data=None, headers=None, cookies=None,
             files=None, auth=None, timeout=60, allow_redirects=False,
             stream=False):
@@ -528,6 +591,23 @@ def request(method, url, params=None, data=None, headers=None, cookies=None,
     opener = urllib2.build_opener(*openers)
     urllib2.install_opener(opener)
 
+    url, data, headers = _encode_request(method, url, params, data, headers,
+                                         files)
+
+    req = urllib2.Request(url, data, headers)
+    return Response(req, stream)
+
+
+def _encode_request(method, url, params=None, data=None, headers=None,
+                    files=None):
+    """Encode URL, body and headers of a request as UTF-8 strings.
+
+    Arguments as for :func:`request`.
+
+    :returns: ``(url, data, headers)``
+    :rtype: 3-tuple ``(str, str, dict)``
+
+    """
     if not headers:
         headers = CaseInsensitiveDictionary()
     else:
@@ -575,8 +655,7 @@ def request(method, url, params=None, data=None, headers=None, cookies=None,
         query = urllib.urlencode(str_dict(params), doseq=True)
         url = urlparse.urlunsplit((scheme, netloc, path, query, fragment))
 
-    req = urllib2.Request(url, data, headers)
-    return Response(req, stream)
+    return url, data, headers
 
 
 def get(url, params=None, headers=None, cookies=None, auth=None,
@@ -602,6 +681,141 @@ def post(url, params=None, data=None, headers=None, cookies=None, files=None,
                    timeout, allow_redirects, stream)
 
 
+class ConnectionPool(object):
+    """Keep-alive HTTP(S) connections that are reused across requests.
+
+    Unlike :func:`request`, a pool doesn't install a global
+    :mod:`urllib2` opener or change the default socket timeout. Each
+    request gets its own timeout. Idle connections are kept per scheme,
+    host and port, so consecutive requests to the same host skip the TCP
+    and TLS handshakes.
+
+    The pool is thread-safe: a connection is only used by one request at
+    a time. Redirects are not followed.
+
+    >>> pool = ConnectionPool()
+    >>> r = pool.post('https://getpocket.com/v3/get', data={...})
+    >>> r.json()
+
+    """
+
+    def __init__(self, maxsize=4, context=None):
+        """Create new pool.
+
+        :param maxsize: maximum number of idle connections kept per host
+        :type maxsize: int
+        :param context: SSL context for HTTPS connections
+        :type context: :class:`ssl.SSLContext`
+
+        """
+        self.maxsize = maxsize
+        self.context = context
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                files=None, timeout=60, stream=False):
+        """Initiate an HTTP(S) request on a pooled connection.
+
+        Arguments as for :func:`request`. Socket and protocol errors are
+        raised as :class:`urllib2.URLError`, same as :func:`request`.
+
+        :returns: :class:`PooledResponse` instance
+
+        """
+        url, data, headers = _encode_request(method, url, params, data,
+                                             headers, files)
+        scheme, netloc, path, query, _ = urlparse.urlsplit(url)
+        if scheme not in ('http', 'https'):
+            raise ValueError('Unsupported URL scheme : {0}'.format(scheme))
+
+        selector = path or '/'
+        if query:
+            selector += '?' + query
+        key = (scheme, netloc)
+
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, selector, data, headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (socket.error, httplib.HTTPException) as err:
+                conn.close()
+                # The server may have closed an idle connection, so try
+                # again on a fresh one
+                if reused and not isinstance(err, socket.timeout):
+                    continue
+                raise urllib2.URLError(err)
+            break
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        return PooledResponse(url, response, body, stream)
+
+    def get(self, url, params=None, headers=None, timeout=60, stream=False):
+        """Initiate a GET request. Arguments as for :func:`request`.
+
+        :returns: :class:`PooledResponse` instance
+
+        """
+        return self.request('GET', url, params, headers=headers,
+                            timeout=timeout, stream=stream)
+
+    def post(self, url, params=None, data=None, headers=None, files=None,
+             timeout=60, stream=False):
+        """Initiate a POST request. Arguments as for :func:`request`.
+
+        :returns: :class:`PooledResponse` instance
+
+        """
+        return self.request('POST', url, params, data, headers, files,
+                            timeout, stream)
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def _acquire(self, key, timeout):
+        """Return an idle connection for ``key`` or open a new one.
+
+        :returns: ``(connection, reused)``
+        :rtype: 2-tuple ``(httplib.HTTPConnection, bool)``
+
+        """
+        with self._lock:
+            connections = self._idle.get(key)
+            conn = connections.pop() if connections else None
+
+        if conn is not None and conn.sock is not None:
+            conn.sock.settimeout(timeout)
+            return conn, True
+
+        scheme, netloc = key
+        if scheme == 'https':
+            conn = httplib.HTTPSConnection(netloc, timeout=timeout,
+                                           context=self.context)
+        else:
+            conn = httplib.HTTPConnection(netloc, timeout=timeout)
+        return conn, False
+
+    def _release(self, key, conn):
+        """Return ``conn`` to the idle connections of ``key``."""
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.maxsize:
+                connections.append(conn)
+                return
+        conn.close()
+
+
 def encode_multipart_formdata(fields, files):
     """Encode form data (``fields``) and ``files`` for POST request.
 
@@ -23,20 +23,24 @@ from __future__ import print_function, unicode_literals
 
 import binascii
 import cPickle
+from cStringIO import StringIO
 from copy import deepcopy
 import json
 import logging
 import logging.handlers
+import marshal
 import os
 import pickle
 import plistlib
 import re
 import shutil
 import string
+import struct
 import subprocess
 import sys
 import time
 import unicodedata
+import zlib
 
 try:
     import xml.etree.cElementTree as ET
@@ -50,6 +54,7 @@ from util import (
     LockFile,
     uninterruptible,
 )
+import jsoncodec
 
 #: Sentinel for properties that haven't been set yet (that might
 #: correctly have the value ``None``)
@@ -583,7 +588,7 @@ class SerializerManager(object):
 
 
 class JSONSerializer(object):
-    """Wrapper around :mod:`json`. Sets ``indent`` and ``encoding``.
+    """Wrapper around :mod:`~workflow.jsoncodec`. Sets ``indent``.
 
     .. versionadded:: 1.8
 
@@ -605,7 +610,7 @@ class JSONSerializer(object):
         :rtype: object
 
         """
-        return json.load(file_obj)
+        return jsoncodec.load(file_obj)
 
     @classmethod
     def dump(cls, obj, file_obj):
@@ -619,7 +624,7 @@ class JSONSerializer(object):
         :type file_obj: ``file`` object
 
         """
-        return json.dump(obj, file_obj, indent=2, encoding='utf-8')
+        return jsoncodec.dump(obj, file_obj, indent=2)
 
 
 class CPickleSerializer(object):
@@ -699,11 +704,177 @@ class PickleSerializer(object):
         return pickle.dump(obj, file_obj, protocol=-1)
 
 
+class MarshalSerializer(object):
+    """Wrapper around :mod:`marshal` with a versioned header.
+
+    Loads data made only of built-in types, such as dicts of strings, a
+    lot faster than ``cPickle``. Any other object, including subclasses
+    of built-in types, raises a :class:`TypeError` when dumped.
+
+    :mod:`marshal` may change its format between Python versions, so the
+    header records the format and Python version, and files written with
+    others raise a :class:`ValueError` when loaded.
+
+    """
+
+    #: Identifies the files of this serializer
+    magic = b'AWM'
+    #: Version of the header and payload format
+    version = 1
+    #: Types that are written as they are, without subclasses
+    types = frozenset([dict, list, tuple, set, frozenset, unicode, str,
+                       int, long, float, bool, type(None)])
+    containers = frozenset([dict, list, tuple, set, frozenset])
+
+    @classmethod
+    def header(cls):
+        """Return the header files are written and checked with."""
+        return cls.magic + struct.pack(b'3B', cls.version,
+                                       *sys.version_info[:2])
+
+    @classmethod
+    def load(cls, file_obj):
+        """Load serialized object from open marshal file.
+
+        :param file_obj: file handle
+        :type file_obj: ``file`` object
+        :returns: object loaded from marshal file
+        :rtype: object
+
+        """
+        header = cls.header()
+        found = file_obj.read(len(header))
+        if found != header:
+            raise ValueError(
+                'Unsupported marshal file header: {0!r}'.format(found))
+        return marshal.loads(file_obj.read())
+
+    @classmethod
+    def dump(cls, obj, file_obj):
+        """Serialize object ``obj`` to open marshal file.
+
+        :param obj: Python object to serialize
+        :type obj: data structure of built-in types
+        :param file_obj: file handle
+        :type file_obj: ``file`` object
+
+        """
+        try:
+            data = marshal.dumps(obj, 2)
+        except ValueError as err:
+            # Raises a TypeError if an object of the wrong type is the cause
+            cls.check(obj)
+            raise ValueError('Cannot marshal object: {0}'.format(err))
+        # marshal writes some subclasses of built-in types as garbage
+        # instead of failing, which reading the data back reveals
+        if marshal.loads(data) != obj:
+            cls.check(obj)
+        file_obj.write(cls.header())
+        file_obj.write(data)
+
+    @classmethod
+    def check(cls, obj):
+        """Raise :class:`TypeError` if ``obj`` can't be marshalled as is."""
+        containers = cls.containers
+        stack = [[obj]]
+        while stack:
+            children = stack.pop()
+            # Check the types of all children at once, which is much
+            # faster than looking at every string on its own
+            kinds = set(map(type, children))
+            if not kinds <= cls.types:
+                child = next(c for c in children if type(c) not in cls.types)
+                raise TypeError('Cannot marshal {0} object: {1!r}'.format(
+                    type(child).__name__, child))
+            if kinds.isdisjoint(containers):
+                continue
+            for child in children:
+                if type(child) is dict:
+                    stack.append(child.keys())
+                    stack.append(child.values())
+                elif type(child) in containers:
+                    stack.append(child)
+
+
+class CompressedSerializer(object):
+    """Compresses the output of another serializer with :mod:`zlib`.
+
+    Trades CPU time for smaller files, which pays off for large caches on
+    slow or encrypted disks. Payloads below the first size of ``levels``
+    are stored uncompressed, larger ones with the compression level of
+    the largest size they reach, e.g. a faster level for very large ones
+    so that dumping them does not take too long.
+
+    :param serializer: object with ``load()`` and ``dump()`` methods
+    :param levels: sorted ``(minimum size, zlib level)`` tuples
+
+    """
+
+    #: Identifies the files of this serializer
+    magic = b'AWZ'
+    #: Default ``(minimum size, zlib level)`` tuples
+    levels = ((4096, 6), (4 * 1024 * 1024, 1))
+
+    def __init__(self, serializer, levels=None):
+        """Create new serializer wrapping ``serializer``."""
+        self.serializer = serializer
+        if levels is not None:
+            self.levels = levels
+
+    def level(self, size):
+        """Return the zlib level for a payload of ``size`` bytes."""
+        level = 0
+        for minimum, candidate in self.levels:
+            if size >= minimum:
+                level = candidate
+        return level
+
+    def load(self, file_obj):
+        """Load serialized object from open compressed file.
+
+        :param file_obj: file handle
+        :type file_obj: ``file`` object
+        :returns: object loaded from compressed file
+        :rtype: object
+
+        """
+        header = file_obj.read(len(self.magic) + 1)
+        if header[:-1] != self.magic or header[-1:] not in (b'0', b'z'):
+            raise ValueError(
+                'Unsupported compressed file header: {0!r}'.format(header))
+        data = file_obj.read()
+        if header[-1:] == b'z':
+            data = zlib.decompress(data)
+        return self.serializer.load(StringIO(data))
+
+    def dump(self, obj, file_obj):
+        """Serialize object ``obj`` to open compressed file.
+
+        :param obj: Python object to serialize
+        :type obj: object supported by the wrapped serializer
+        :param file_obj: file handle
+        :type file_obj: ``file`` object
+
+        """
+        buf = StringIO()
+        self.serializer.dump(obj, buf)
+        data = buf.getvalue()
+        level = self.level(len(data))
+        if level:
+            file_obj.write(self.magic + b'z')
+            file_obj.write(zlib.compress(data, level))
+        else:
+            file_obj.write(self.magic + b'0')
+            file_obj.write(data)
+
+
 # Set up default manager and register built-in serializers
 manager = SerializerManager()
 manager.register('cpickle', CPickleSerializer)
 manager.register('pickle', PickleSerializer)
 manager.register('json', JSONSerializer)
+manager.register('marshal', MarshalSerializer)
+manager.register('zmarshal', CompressedSerializer(MarshalSerializer))
 
 
 class Item(object):
@@ -886,6 +1057,92 @@ class Settings(dict):
         return ret
 
 
+class SecurityKeychain(object):
+    """Keychain backend that calls the ``security`` CLI program.
+
+    Used by :class:`Workflow` to store passwords. Any object with the
+    same ``add``, ``get`` and ``delete`` methods can replace it as
+    :attr:`Workflow.keychain`, e.g. a stub on systems without Keychain.
+
+    """
+
+    def add(self, service, account, password):
+        """Save a password.
+
+        Raise :class:`PasswordExists` if ``service/account`` exists.
+
+        """
+        self.call('add-generic-password', service, account, '-w', password)
+
+    def get(self, service, account):
+        """Return the password saved at ``service/account``.
+
+        Raise :class:`PasswordNotFound` if there is no such password.
+
+        """
+        output = self.call('find-generic-password', service, account, '-g')
+
+        # Parsing of `security` output is adapted from python-keyring
+        # by Jason R. Coombs
+        # https://pypi.python.org/pypi/keyring
+        m = re.search(
+            r'password:\s*(?:0x(?P<hex>[0-9A-F]+)\s*)?(?:"(?P<pw>.*)")?',
+            output)
+
+        password = None
+        if m:
+            groups = m.groupdict()
+            h = groups.get('hex')
+            password = groups.get('pw')
+            if h:
+                password = unicode(binascii.unhexlify(h), 'utf-8')
+
+        return password
+
+    def delete(self, service, account):
+        """Delete the password saved at ``service/account``.
+
+        Raise :class:`PasswordNotFound` if there is no such password.
+
+        """
+        self.call('delete-generic-password', service, account)
+
+    def call(self, action, service, account, *args):
+        """Call ``security`` CLI program that provides access to keychains.
+
+        May raise `PasswordNotFound`, `PasswordExists` or `KeychainError`
+        exceptions (the first two are subclasses of `KeychainError`).
+
+        :param action: The ``security`` action to call, e.g.
+                           ``add-generic-password``
+        :type action: ``unicode``
+        :param service: Name of the service.
+        :type service: ``unicode``
+        :param account: name of the account the password is for, e.g.
+            "Pinboard"
+        :type account: ``unicode``
+        :param *args: list of command line arguments to be passed to
+                      ``security``
+        :type *args: `list` or `tuple`
+        :returns: output of ``security``
+        :rtype: ``unicode``
+
+        """
+        cmd = ['security', action, '-s', service, '-a', account] + list(args)
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT)
+        stdout, _ = p.communicate()
+        if p.returncode == 44:  # password does not exist
+            raise PasswordNotFound()
+        elif p.returncode == 45:  # password already exists
+            raise PasswordExists()
+        elif p.returncode > 0:
+            err = KeychainError('Unknown Keychain error : %s' % stdout)
+            err.retcode = p.returncode
+            raise err
+        return stdout.strip().decode('utf-8')
+
+
 class Workflow(object):
     """The ``Workflow`` object is the main interface to Alfred-Workflow.
 
@@ -936,6 +1193,9 @@ class Workflow(object):
     # won't want to change this
     item_class = Item
 
+    #: Backend used by the ``*_password`` methods
+    keychain = SecurityKeychain()
+
     def __init__(self, default_settings=None, update_settings=None,
                  input_encoding='utf-8', normalization='NFC',
                  capture_args=True, libraries=None,
@@ -955,6 +1215,9 @@ class Workflow(object):
         self._name = None
         self._cache_serializer = 'cpickle'
         self._data_serializer = 'cpickle'
+        # Stat results and data of cache files read during this run
+        self._cache_stats = {}
+        self._cache_memo = {}
         self._info = None
         self._info_loaded = False
         self._logger = None
@@ -966,6 +1229,8 @@ class Workflow(object):
         self._last_version_run = UNSET
         # Cache for regex patterns created for filter keys
         self._search_pattern_cache = {}
+        # Passwords read from or saved to the Keychain by this process
+        self._passwords = {}
         #: Prefix for all magic arguments.
         #: The default value is ``workflow:`` so keyword
         #: ``config`` would match user query ``workflow:config``.
@@ -1689,11 +1954,31 @@ class Workflow(object):
         cache_path = self.cachefile('%s.%s' % (name, self.cache_serializer))
         age = self.cached_data_age(name)
 
-        if (age < max_age or max_age == 0) and os.path.exists(cache_path):
-
-            with open(cache_path, 'rb') as file_obj:
-                self.logger.debug('loading cached data: %s', cache_path)
-                return serializer.load(file_obj)
+        fresh = age < max_age or max_age == 0
+        if fresh and cache_path in self._cache_memo:
+            return self._cache_memo[cache_path]
+
+        if fresh and cache_path in self._cache_stats:
+            try:
+                with open(cache_path, 'rb') as file_obj:
+                    self.logger.debug('loading cached data: %s', cache_path)
+                    data = serializer.load(file_obj)
+            except IOError:
+                # Deleted by another process since it was looked at
+                self._forget_cache_file(cache_path)
+            except ValueError as err:
+                # Written in a format the serializer no longer reads, e.g.
+                # a marshal file of another Python version
+                self.logger.debug('discarding cached data: %s (%s)',
+                                  cache_path, err)
+                try:
+                    os.unlink(cache_path)
+                except OSError:
+                    pass
+                self._forget_cache_file(cache_path)
+            else:
+                self._cache_memo[cache_path] = data
+                return data
 
         if not data_func:
             return None
@@ -1717,6 +2002,7 @@ class Workflow(object):
         serializer = manager.serializer(self.cache_serializer)
 
         cache_path = self.cachefile('%s.%s' % (name, self.cache_serializer))
+        self._forget_cache_file(cache_path)
 
         if data is None:
             if os.path.exists(cache_path):
@@ -1757,10 +2043,40 @@ class Workflow(object):
         """
         cache_path = self.cachefile('%s.%s' % (name, self.cache_serializer))
 
-        if not os.path.exists(cache_path):
-            return 0
+        stat = self._cache_stats.get(cache_path)
+        if stat is None:
+            try:
+                stat = os.stat(cache_path)
+            except OSError:
+                # Not remembered, so polling for the cache works
+                return 0
+            self._cache_stats[cache_path] = stat
+
+        return time.time() - stat.st_mtime
 
-        return time.time() - os.stat(cache_path).st_mtime
+    def forget_cached_data(self, name=None):
+        """Forget what was read about cache ``name`` or all caches.
+
+        Each cache file is only looked at and loaded once per run, later
+        calls of :meth:`cached_data` return the same object. Call this to
+        see changes other processes made since, e.g. after acquiring a
+        lock that guards the cache.
+
+        :param name: name of datastore or ``None`` for all of them
+        :type name: ``unicode``
+
+        """
+        if name is None:
+            self._cache_stats.clear()
+            self._cache_memo.clear()
+            return
+
+        self._forget_cache_file(
+            self.cachefile('%s.%s' % (name, self.cache_serializer)))
+
+    def _forget_cache_file(self, cache_path):
+        self._cache_stats.pop(cache_path, None)
+        self._cache_memo.pop(cache_path, None)
 
     def filter(self, query, items, key=lambda x: x, ascending=False,
                include_score=False, min_score=0, max_results=0,
@@ -2317,8 +2633,10 @@ class Workflow(object):
             self.logger.debug('Auto update turned off by user')
             return
 
-        # Check for new version if it's time
-        if (force or not self.cached_data_fresh(key, frequency * 86400)):
+        # Check for new version if it's time. update.py caches the result
+        # with the standard serialiser, whatever this workflow uses
+        if (force or
+                not Workflow().cached_data_fresh(key, frequency * 86400)):
 
             repo = self._update_settings['github_slug']
             # version = self._update_settings['version']
@@ -2406,28 +2724,31 @@ class Workflow(object):
             service = self.bundleid
 
         try:
-            self._call_security('add-generic-password', service, account,
-                                '-w', password)
+            self.keychain.add(service, account, password)
             self.logger.debug('saved password : %s:%s', service, account)
 
         except PasswordExists:
             self.logger.debug('password exists : %s:%s', service, account)
-            current_password = self.get_password(account, service)
+            current_password = self.keychain.get(service, account)
 
             if current_password == password:
                 self.logger.debug('password unchanged')
 
             else:
                 self.delete_password(account, service)
-                self._call_security('add-generic-password', service,
-                                    account, '-w', password)
+                self.keychain.add(service, account, password)
                 self.logger.debug('save_password : %s:%s', service, account)
 
+        self._passwords[(service, account)] = password
+
     def get_password(self, account, service=None):
         """Retrieve the password saved at ``service/account``.
 
         Raise :class:`PasswordNotFound` exception if password doesn't exist.
 
+        Passwords are remembered for the lifetime of this object, so
+        that the Keychain is only queried once per process.
+
         :param account: name of the account the password is for, e.g.
             "Pinboard"
         :type account: ``unicode``
@@ -2441,22 +2762,14 @@ class Workflow(object):
         if not service:
             service = self.bundleid
 
-        output = self._call_security('find-generic-password', service,
-                                     account, '-g')
-
-        # Parsing of `security` output is adapted from python-keyring
-        # by Jason R. Coombs
-        # https://pypi.python.org/pypi/keyring
-        m = re.search(
-            r'password:\s*(?:0x(?P<hex>[0-9A-F]+)\s*)?(?:"(?P<pw>.*)")?',
-            output)
+        password = self._passwords.get((service, account))
+        if password is not None:
+            self.logger.debug('got cached password : %s:%s', service, account)
+            return password
 
-        if m:
-            groups = m.groupdict()
-            h = groups.get('hex')
-            password = groups.get('pw')
-            if h:
-                password = unicode(binascii.unhexlify(h), 'utf-8')
+        password = self.keychain.get(service, account)
+        if password is not None:
+            self._passwords[(service, account)] = password
 
         self.logger.debug('got password : %s:%s', service, account)
 
@@ -2478,7 +2791,8 @@ class Workflow(object):
         if not service:
             service = self.bundleid
 
-        self._call_security('delete-generic-password', service, account)
+        self._passwords.pop((service, account), None)
+        self.keychain.delete(service, account)
 
         self.logger.debug('deleted password : %s:%s', service, account)
 
@@ -2607,6 +2921,7 @@ class Workflow(object):
         :type filter_func: ``callable``
         """
         self._delete_directory_contents(self.cachedir, filter_func)
+        self.forget_cached_data()
 
     def clear_data(self, filter_func=lambda f: True):
         """Delete all files in workflow's :attr:`datadir`.
@@ -2781,41 +3096,3 @@ class Workflow(object):
         if not os.path.exists(dirpath):
             os.makedirs(dirpath)
         return dirpath
-
-    def _call_security(self, action, service, account, *args):
-        """Call ``security`` CLI program that provides access to keychains.
-
-        May raise `PasswordNotFound`, `PasswordExists` or `KeychainError`
-        exceptions (the first two are subclasses of `KeychainError`).
-
-        :param action: The ``security`` action to call, e.g.
-                           ``add-generic-password``
-        :type action: ``unicode``
-        :param service: Name of the service.
-        :type service: ``unicode``
-        :param account: name of the account the password is for, e.g.
-            "Pinboard"
-        :type account: ``unicode``
-        :param password: the password to secure
-        :type password: ``unicode``
-        :param *args: list of command line arguments to be passed to
-                      ``security``
-        :type *args: `list` or `tuple`
-        :returns: ``(retcode, output)``. ``retcode`` is an `int`, ``output`` a
-                  ``unicode`` string.
-        :rtype: `tuple` (`int`, ``unicode``)
-
-        """
-        cmd = ['security', action, '-s', service, '-a', account] + list(args)
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                             stderr=subprocess.STDOUT)
-        stdout, _ = p.communicate()
-        if p.returncode == 44:  # password does not exist
-            raise PasswordNotFound()
-        elif p.returncode == 45:  # password already exists
-            raise PasswordExists()
-        elif p.returncode > 0:
-            err = KeychainError('Unknown Keychain error : %s' % stdout)
-            err.retcode = p.returncode
-            raise err
-        return stdout.strip().decode('utf-8')